@@ -0,0 +1,508 @@
+#!/usr/bin/env python
+
+'''
+ Analyzer for iPhone backup made by Apple iTunes
+
+ (C)opyright 2013 Mario Piccinelli <mario.piccinelli@gmail.com>
+ Released under MIT licence
+
+ backupindex.BackupIndex parses the manifest of an iOS backup into the index
+ database (tables "indice" and "properties", see README) and answers the
+ queries made by the GUI and by the plugins. It has no Qt dependency, so it can
+ be used from scripts and headless services:
+
+     index = BackupIndex()
+     index.open("/path/to/backup")
+     print index.stats()
+     print index.lookup("HomeDomain", "", "Library/SMS", "sms.db")['fileid']
+
+ Command line usage: python backupindex.py <backup dir> prints the index stats.
+
+'''
+
+import os, sys, time, sqlite3
+
+import mbdbdecoding, indexcache, magic
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+def hex2nums(src):
+	return ' '.join(["%02X"%ord(x) for x in src])
+
+# manifest strings are UTF-8 bytes: sqlite3 only binds them as unicode
+def text(value):
+	if (isinstance(value, str)):
+		return value.decode("utf-8", "replace")
+	return value
+
+# first record of "indice" matching the given fields (empty values match anything), None if not found
+def lookup(cursor, domain_type="", domain="", path="", name=""):
+	query = "SELECT * FROM indice WHERE 1=1"
+	args = []
+	for column, value in [("domain_type", domain_type), ("domain", domain), ("file_path", path), ("file_name", name)]:
+		if (value != ""):
+			query += " AND %s = ?"%column
+			args.append(value)
+	query += " LIMIT 1"
+	cursor.execute(query, [text(arg) for arg in args])
+	return cursor.fetchone()
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+class IngestCancelled(Exception):
+	"""Raised by BackupIndex.build when its cancelled() callback returns True."""
+	pass
+
+class BackupIndex(object):
+
+	# rows inserted by each executemany call
+	batchSize = 2000
+
+	def __init__(self):
+		self.backup_path = None
+		self.database = None
+		self.cursor = None
+		self.cached = False
+		self.buildTime = None
+		self.fileName = None
+
+	def open(self, path, progress=None, domainDone=None, cancelled=None, fingerprint=None):
+		"""
+		Open the backup in "path", reusing the cached index when the manifest did not change.
+
+		progress is an optional callable(done, total) called while the manifest is parsed
+		(done and total are byte offsets in Manifest.mbdb); see build() for domainDone and
+		cancelled. If the build is cancelled the partial index is deleted. fingerprint is
+		the indexcache.manifestFingerprint of the backup, if already computed.
+		Returns True if the index came from the cache.
+		"""
+		self.close()
+
+		self.backup_path = os.path.abspath(path)
+		mbdbPath = os.path.join(self.backup_path, "Manifest.mbdb")
+		if (not os.path.exists(mbdbPath)):
+			raise IOError("Manifest.mbdb/Manifest.mbdx not found in path \"%s\". Are you sure this is a correct iOS backup dir?"%(self.backup_path))
+
+		self.database, self.cached = indexcache.openIndex(self.backup_path, fingerprint)
+		self.database.row_factory = sqlite3.Row
+		self.cursor = self.database.cursor()
+		self.fileName = self.database.execute("PRAGMA database_list").fetchone()[2]
+
+		if (not self.cached):
+			try:
+				self.build(progress, domainDone, cancelled)
+			except:
+				error = sys.exc_info()
+				fileName = self.fileName
+				self.close()
+				try:
+					indexcache.removeIndex(fileName)
+				except OSError:
+					print("Unable to remove partial index %s: %s"%(fileName, sys.exc_info()[1]))
+				raise error[0], error[1], error[2]
+			indexcache.markComplete(self.database)
+
+		return self.cached
+
+	def attach(self, path, fileName):
+		"""
+		Open an index file directly, for instance one still being built by open() in
+		another thread (rows are visible as soon as the builder commits them).
+		"""
+		self.close()
+
+		self.backup_path = os.path.abspath(path)
+		self.fileName = fileName
+		self.database = sqlite3.connect(fileName)
+		self.database.row_factory = sqlite3.Row
+		self.cursor = self.database.cursor()
+		self.cached = indexcache.isComplete(self.database)
+
+	def close(self, removeTemporary=True):
+		"""
+		Close the index. An index built in the temp dir (cache dir not writable, see
+		indexcache.openIndex) is deleted, unless removeTemporary is False because
+		another connection still reads it.
+		"""
+		if (self.database != None):
+			self.database.close()
+		if (removeTemporary and self.fileName != None and indexcache.isTemporary(self.fileName)):
+			try:
+				indexcache.removeIndex(self.fileName)
+			except OSError:
+				print("Unable to remove temporary index %s: %s"%(self.fileName, sys.exc_info()[1]))
+		self.database = None
+		self.cursor = None
+		self.backup_path = None
+		self.fileName = None
+
+	# ------------------------------------------------------------------------------------------------------------------------
+
+	def createTables(self):
+		self.cursor.execute(
+			"CREATE TABLE indice (" +
+			"id INTEGER PRIMARY KEY AUTOINCREMENT," +
+			"type VARCHAR(1)," +
+			"permissions VARCHAR(9)," +
+			"userid VARCHAR(8)," +
+			"groupid VARCHAR(8)," +
+			"filelen INT," +
+			"mtime INT," +
+			"atime INT," +
+			"ctime INT," +
+			"fileid VARCHAR(50)," +
+			"domain_type VARCHAR(100)," +
+			"domain VARCHAR(100)," +
+			"file_path VARCHAR(100)," +
+			"file_name VARCHAR(100)," +
+			"link_target VARCHAR(100)," +
+			"datahash VARCHAR(100)," +
+			"flag VARCHAR(100)," +
+			"magic VARCHAR(100)"
+			");"
+		)
+
+		self.cursor.execute(
+			"CREATE TABLE properties (" +
+			"id INTEGER PRIMARY KEY AUTOINCREMENT," +
+			"file_id INTEGER," +
+			"property_name VARCHAR(100)," +
+			"property_val VARCHAR(100)" +
+			");"
+		)
+
+		# every directory of every domain, including those listed in the manifest only
+		# as the path of their files, so that the tree can be browsed by parent path
+		self.cursor.execute(
+			"CREATE TABLE directories (" +
+			"id INTEGER PRIMARY KEY AUTOINCREMENT," +
+			"domain_type VARCHAR(100)," +
+			"domain VARCHAR(100)," +
+			"path VARCHAR(100)," +
+			"parent_path VARCHAR(100)," +
+			"name VARCHAR(100)" +
+			");"
+		)
+
+	def createIndexes(self):
+		self.cursor.execute('CREATE INDEX indice_domain_path on indice (domain_type, domain, file_path);')
+		self.cursor.execute('CREATE INDEX properties_file_id on properties (file_id);')
+		self.cursor.execute('CREATE INDEX directories_parent on directories (domain_type, domain, parent_path, name);')
+		self.cursor.execute('CREATE INDEX indice_magic on indice (magic);')
+
+	# yields the "indice" rows for the records of the manifest, collecting the
+	# property rows in propertyRows and the rows of the directories met for the
+	# first time in directoryRows
+	def iterRows(self, propertyRows, directoryRows):
+
+		# if exists Manifest.mbdx, then iOS <= 4
+		iOSVersion = 5
+		mbdxPath = os.path.join(self.backup_path, "Manifest.mbdx")
+		mbdbPath = os.path.join(self.backup_path, "Manifest.mbdb")
+		if (os.path.exists(mbdxPath)):
+			iOSVersion = 4
+			mbdx = mbdbdecoding.process_mbdx_file(mbdxPath)
+
+		records = mbdbdecoding.iter_mbdb_records(mbdbPath)
+
+		# iOS 5 (no MBDX file, file ID is the SHA1 of complete file name)
+		if (iOSVersion == 5):
+			records = mbdbdecoding.iter_file_ids(records)
+
+		# ids are assigned here, so that properties can reference their file
+		# without reading the row back
+		items = 0
+		knownDirectories = set()
+		for fileinfo in records:
+			offset = fileinfo['start_offset']
+
+			# iOS 4 (get file ID from mbdx file)
+			if (iOSVersion == 4):
+				if offset in mbdx:
+					fileinfo['fileID'] = mbdx[offset]
+				else:
+					fileinfo['fileID'] = "<nofileID>"
+					print >> sys.stderr, "No fileID found for %s" % fileinfo['filename']
+
+			# decoding element type (symlink, file, directory)
+			if (fileinfo['mode'] & 0xE000) == 0xA000: obj_type = 'l' # symlink
+			elif (fileinfo['mode'] & 0xE000) == 0x8000: obj_type = '-' # file
+			elif (fileinfo['mode'] & 0xE000) == 0x4000: obj_type = 'd' # dir
+			else: obj_type = '?' # unknown
+
+			# separates domain type (AppDomain, HomeDomain, ...) from domain name
+			domaintype, sep, domain = fileinfo['domain'].partition('-')
+
+			# separates file name from file path
+			filepath, sep, filename = fileinfo['filename'].rpartition('/')
+			if (obj_type == 'd'):
+				filepath = fileinfo['filename']
+				filename = "";
+
+			items += 1
+
+			if (fileinfo['numprops'] > 0):
+				for name, val in fileinfo['properties'].items():
+					propertyRows.append((items, text(name), hex2nums(val)))
+
+			# the directory of the element and all its ancestors (up to the first
+			# one already known)
+			directory = filepath
+			while (directory != "" and (fileinfo['domain'], directory) not in knownDirectories):
+				knownDirectories.add((fileinfo['domain'], directory))
+				parent, sep, name = directory.rpartition('/')
+				directoryRows.append((text(domaintype), text(domain), text(directory), text(parent), text(name)))
+				directory = parent
+
+			yield offset, (
+				items,
+				obj_type,
+				mbdbdecoding.modestr(fileinfo['mode']&0x0FFF),
+				"%08x" % fileinfo['userid'],
+				"%08x" % fileinfo['groupid'],
+				fileinfo['filelen'],
+				fileinfo['mtime'],
+				fileinfo['atime'],
+				fileinfo['ctime'],
+				fileinfo['fileID'],
+				text(domaintype),
+				text(domain),
+				text(filepath),
+				text(filename),
+				text(fileinfo['linktarget']),
+				hex2nums(fileinfo['datahash']),
+				str(fileinfo['flag'])
+			)
+
+	def build(self, progress=None, domainDone=None, cancelled=None):
+		"""
+		Parse the manifest and populate the (empty) index database.
+
+		progress(done, total) is called after each batch of rows. If domainDone is given,
+		each batch is committed and domainDone(domain_type, domain) is called for the
+		domains the manifest moved past, so that another connection can read them while
+		the build goes on (a domain is reported again if the manifest lists it in more
+		than one run). If cancelled() returns True the build stops raising IngestCancelled.
+		"""
+		startTime = time.time()
+		mbdbSize = os.path.getsize(os.path.join(self.backup_path, "Manifest.mbdb"))
+
+		self.createTables()
+
+		# readers query each domain as soon as it is reported: they need the
+		# indexes from the start (bulk builds create them at the end, it is faster)
+		if (domainDone != None):
+			self.createIndexes()
+
+		insertFile = "INSERT INTO indice(id, type, permissions, userid, groupid, filelen, mtime, atime, ctime, fileid, domain_type, domain, file_path, file_name, link_target, datahash, flag) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);"
+		insertProperty = "INSERT INTO properties(file_id, property_name, property_val) VALUES (?, ?, ?);"
+		insertDirectory = "INSERT INTO directories(domain_type, domain, path, parent_path, name) VALUES (?, ?, ?, ?, ?);"
+
+		# files are inserted in batches while the manifest is parsed, properties
+		# and directories at the end (or with each batch, if reporting domains)
+		items = 0
+		batch = []
+		propertyRows = []
+		directoryRows = []
+		currentDomain = None
+		finishedDomains = []
+		for offset, row in self.iterRows(propertyRows, directoryRows):
+
+			if (domainDone != None and (row[10], row[11]) != currentDomain):
+				if (currentDomain != None and currentDomain not in finishedDomains):
+					finishedDomains.append(currentDomain)
+				currentDomain = (row[10], row[11])
+
+			batch.append(row)
+			if (len(batch) == self.batchSize):
+				self.cursor.executemany(insertFile, batch)
+				items += len(batch)
+				batch = []
+				if (domainDone != None):
+					self.cursor.executemany(insertProperty, propertyRows)
+					self.cursor.executemany(insertDirectory, directoryRows)
+					del propertyRows[:]
+					del directoryRows[:]
+					self.database.commit()
+					for domain in finishedDomains:
+						domainDone(*domain)
+					finishedDomains = []
+				if (progress != None):
+					progress(offset, mbdbSize)
+				if (cancelled != None and cancelled()):
+					raise IngestCancelled()
+
+		self.cursor.executemany(insertFile, batch)
+		items += len(batch)
+		self.cursor.executemany(insertProperty, propertyRows)
+		self.cursor.executemany(insertDirectory, directoryRows)
+
+		if (domainDone == None):
+			self.createIndexes()
+		self.database.commit()
+		if (domainDone != None):
+			if (currentDomain != None and currentDomain not in finishedDomains):
+				finishedDomains.append(currentDomain)
+			for domain in finishedDomains:
+				domainDone(*domain)
+
+		self.buildTime = max(time.time() - startTime, 0.001)
+		print("Indexed %i files in %.2f s (%i rows/s)"%(items, self.buildTime, items / self.buildTime))
+
+	def classify(self, workers=8, progress=None, cancelled=None, cache=None):
+		"""
+		Store in the "magic" column the type (see magic.py) of the regular files not
+		classified yet; files missing from the backup get "". Files are read by
+		magic.classify_many in "workers" threads (the work is mostly I/O); types
+		found in "cache" (a typecache.TypeCache) are not read again.
+
+		progress(done, total) is called after each committed batch; if cancelled()
+		returns True the classification stops raising IngestCancelled (the batches
+		already committed are kept, and skipped by the next call).
+		Returns the number of files classified.
+		"""
+		# ids by file (files without fileID share the same name)
+		query = "SELECT id, fileid FROM indice WHERE type = '-' AND magic IS NULL"
+		elements = {}
+		for id, fileid in self.database.execute(query):
+			elements.setdefault(os.path.join(self.backup_path, fileid), []).append(id)
+		total = sum([len(ids) for ids in elements.values()])
+
+		update = "UPDATE indice SET magic = ? WHERE id = ?"
+		done = 0
+		batch = []
+		for path, filemagic in magic.classify_many(elements.keys(), workers, cache=cache):
+			for id in elements[path]:
+				batch.append((text(filemagic or ""), id))
+			if (len(batch) >= self.batchSize):
+				self.database.executemany(update, batch)
+				self.database.commit()
+				done += len(batch)
+				batch = []
+				if (progress != None):
+					progress(done, total)
+				if (cancelled != None and cancelled()):
+					raise IngestCancelled()
+		self.database.executemany(update, batch)
+		self.database.commit()
+		done += len(batch)
+		return done
+
+	# ------------------------------------------------------------------------------------------------------------------------
+
+	def lookup(self, domain_type="", domain="", path="", name=""):
+		"""
+		First element matching the given fields (empty values match anything), None if not found.
+		"""
+		return lookup(self.cursor, domain_type, domain, path, name)
+
+	def element(self, id):
+		"""
+		The "indice" record with the given id, None if not found.
+		"""
+		self.cursor.execute("SELECT * FROM indice WHERE id = ?", (id,))
+		return self.cursor.fetchone()
+
+	def properties(self, id):
+		"""
+		List of (name, value) properties (from the mbdb file) of the element with the given id.
+		"""
+		self.cursor.execute("SELECT property_name, property_val FROM properties WHERE file_id = ?", (id,))
+		return self.cursor.fetchall()
+
+	def domain_types(self):
+		self.cursor.execute("SELECT DISTINCT(domain_type) FROM indice")
+		return [row[0] for row in self.cursor.fetchall()]
+
+	def domains(self, domain_type):
+		self.cursor.execute("SELECT DISTINCT(domain) FROM indice WHERE domain_type = ? ORDER BY domain", (domain_type,))
+		return [row[0] for row in self.cursor.fetchall()]
+
+	def iter_domain(self, domain_type, domain):
+		"""
+		All the elements of a domain, ordered by path and name.
+		"""
+		query = "SELECT * FROM indice WHERE domain_type = ? AND domain = ? ORDER BY file_path, file_name"
+		return self.database.execute(query, (domain_type, domain))
+
+	def domain_root(self, domain_type, domain):
+		"""
+		The "indice" record of the root directory of a domain (the 'd' element with an
+		empty path), None if the manifest does not list it.
+		"""
+		query = "SELECT * FROM indice WHERE domain_type = ? AND domain = ? AND file_path = '' AND type = 'd' LIMIT 1"
+		self.cursor.execute(query, (text(domain_type), text(domain)))
+		return self.cursor.fetchone()
+
+	def iter_children(self, domain_type, domain, path=""):
+		"""
+		Elements directly inside directory "path" of a domain ("" is the domain root):
+		directories first, then files, each group sorted by name.
+		Yields rows with columns id, type, name, path, filelen; "path" is the full path
+		of directories and the parent path of files. Directories not listed in the
+		manifest have id None.
+		"""
+		domain_type, domain, path = text(domain_type), text(domain), text(path)
+		query = "SELECT MIN(indice.id) AS id, 'd' AS type, directories.name AS name, directories.path AS path, 0 AS filelen " + \
+			"FROM directories LEFT JOIN indice ON (indice.domain_type = directories.domain_type AND indice.domain = directories.domain AND indice.file_path = directories.path AND indice.type = 'd') " + \
+			"WHERE directories.domain_type = ? AND directories.domain = ? AND directories.parent_path = ? " + \
+			"GROUP BY directories.id ORDER BY directories.name"
+		for row in self.database.execute(query, (domain_type, domain, path)):
+			yield row
+		query = "SELECT id, type, file_name AS name, file_path AS path, filelen FROM indice WHERE domain_type = ? AND domain = ? AND file_path = ? AND type != 'd' ORDER BY file_name"
+		for row in self.database.execute(query, (domain_type, domain, path)):
+			yield row
+
+	def iter_type(self, magic_type):
+		"""
+		Regular files of the given type ("data/sqlite", ...) or family of types ("image/"),
+		as classified by classify().
+		"""
+		magic_type = text(magic_type)
+		if (magic_type.endswith("/")):
+			# the types of a family sort between "family/" and "family0"
+			query = "SELECT * FROM indice WHERE magic >= ? AND magic < ? ORDER BY domain_type, domain, file_path, file_name"
+			return self.database.execute(query, (magic_type, magic_type[:-1] + "0"))
+		query = "SELECT * FROM indice WHERE magic = ? ORDER BY domain_type, domain, file_path, file_name"
+		return self.database.execute(query, (magic_type,))
+
+	def classified(self):
+		"""
+		True if classify() has stored the type of every regular file.
+		"""
+		self.cursor.execute("SELECT COUNT(*) FROM indice WHERE type = '-' AND magic IS NULL")
+		return self.cursor.fetchone()[0] == 0
+
+	def stats(self):
+		"""
+		Dictionary of counters describing the open backup.
+		"""
+		stats = {
+			'backup_path': self.backup_path,
+			'cached': self.cached,
+			'build_time': self.buildTime,
+		}
+		self.cursor.execute("SELECT type, COUNT(*), SUM(filelen) FROM indice GROUP BY type")
+		types = dict((row[0], (row[1], row[2])) for row in self.cursor.fetchall())
+		stats['elements'] = sum([count for count, size in types.values()])
+		stats['files'] = types.get('-', (0, 0))[0]
+		stats['directories'] = types.get('d', (0, 0))[0]
+		stats['links'] = types.get('l', (0, 0))[0]
+		stats['total_size'] = types.get('-', (0, 0))[1] or 0
+		self.cursor.execute("SELECT COUNT(DISTINCT domain_type), COUNT(DISTINCT domain_type || '-' || domain) FROM indice")
+		stats['domain_types'], stats['domains'] = self.cursor.fetchone()
+		self.cursor.execute("SELECT COUNT(*) FROM properties")
+		stats['properties'] = self.cursor.fetchone()[0]
+		return stats
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+	if (len(sys.argv) < 2):
+		print("Usage: python backupindex.py <backup dir>")
+		sys.exit(1)
+	index = BackupIndex()
+	index.open(sys.argv[1])
+	for key, value in sorted(index.stats().items()):
+		print("%s: %s"%(key, value))
+	index.close()
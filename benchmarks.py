@@ -0,0 +1,774 @@
+#!/usr/bin/env python
+
+'''
+ Analyzer for iPhone backup made by Apple iTunes
+
+ (C)opyright 2013 Mario Piccinelli <mario.piccinelli@gmail.com>
+ Released under MIT licence
+
+ Benchmarks for the parsing routines used by iPBA2.
+
+ Usage: python benchmarks.py <benchmark> [args]
+ Run without arguments to list the available benchmarks.
+
+'''
+
+import sys, os, gc, time, struct, random, tempfile, shutil, binascii, hashlib, cPickle, multiprocessing, subprocess, threading, datetime, itertools, plistlib
+import xml.dom.minidom
+
+import mbdbdecoding, magic, biplist, plistutils, keyedarchive, typecache
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# writes a synthetic Manifest.mbdb with "count" records (deterministic content)
+def writeSyntheticMbdb(fileName, count, seed=0):
+
+	rnd = random.Random(seed)
+	domains = ["HomeDomain", "MediaDomain", "RootDomain", "SystemPreferencesDomain", "WirelessDomain"]
+	domains += ["AppDomain-com.example.app%03i" % i for i in range(200)]
+
+	def string(value):
+		if (value == None):
+			return "\xff\xff"
+		return struct.pack(">H", len(value)) + value
+
+	out = open(fileName, 'wb')
+	out.write("mbdb\x05\x00")
+	for i in range(count):
+		domain = rnd.choice(domains)
+		if (i % 10 == 0):
+			mode = 0x41ed # directory
+			path = "Library/Dir%04i" % (i / 10)
+			datahash = None
+		else:
+			mode = 0x81a4 # file
+			path = "Library/Dir%04i/file%07i.db" % (i / 10, i)
+			datahash = binascii.unhexlify("%040x" % rnd.getrandbits(160))
+		record = string(domain) + string(path) + string(None) + string(datahash) + string(None)
+		record += struct.pack(">HIIIIIIIQBB", mode, 0, 0, 501, 501,
+			1360000000 + i, 1360000000 + i, 1360000000 + i, rnd.randint(0, 1 << 20), 4, i % 50 == 0 and 1 or 0)
+		if (i % 50 == 0):
+			record += string("com.apple.assetsd.UUID") + string("%032x" % i)
+		out.write(record)
+	out.close()
+
+# writes a synthetic Manifest.mbdx with "count" records pointing to increasing offsets
+def writeSyntheticMbdx(fileName, count, seed=0):
+
+	rnd = random.Random(seed)
+	out = open(fileName, 'wb')
+	out.write("mbdx\x02\x00" + struct.pack(">I", count))
+	for i in range(count):
+		fileID = binascii.unhexlify("%040x" % rnd.getrandbits(160))
+		out.write(fileID + struct.pack(">IH", i * 150, 0x81a4))
+	out.close()
+
+# marker byte (and length int, from 15 on) of a binary plist object
+def plistMarker(kind, length):
+	if (length < 15):
+		return chr((kind << 4) | length)
+	return chr((kind << 4) | 0x0f) + "\x12" + struct.pack(">I", length)
+
+# 4 byte object references
+def plistRefs(numbers):
+	return "".join([struct.pack(">I", number) for number in numbers])
+
+# writes the encoded "objects" as a binary plist with object 0 as root; returns the object count
+def writeBinaryPlist(fileName, objects):
+	out = open(fileName, 'wb')
+	out.write("bplist00")
+	offsets = []
+	position = 8
+	for data in objects:
+		offsets.append(position)
+		out.write(data)
+		position += len(data)
+	out.write(plistRefs(offsets))
+	out.write("\x00" * 6 + struct.pack(">BBQQQ", 4, 4, len(objects), 0, position))
+	out.close()
+	return len(objects)
+
+# writes a synthetic binary plist shaped like a NSKeyedArchiver file: "count" dicts in $objects,
+# each with its own name string and number, sharing keys and $class references (3 * count + 15 objects)
+def writeSyntheticPlist(fileName, count, seed=0):
+
+	rnd = random.Random(seed)
+	objects = []
+
+	def add(data):
+		objects.append(data)
+		return len(objects) - 1
+
+	# object 0 is the root dict, written last
+	objects.append(None)
+	keys = dict([(key, add(plistMarker(5, len(key)) + key)) for key in ["$archiver", "$version", "$top", "$objects", "$class", "name", "value", "root"]])
+	archiver = add(plistMarker(5, 15) + "NSKeyedArchiver")
+	version = add("\x12" + struct.pack(">I", 100000))
+	classes = [add("\x81" + struct.pack(">H", i + 1)) for i in range(2)]
+
+	records = []
+	for i in range(count):
+		name = "Record %08i" % rnd.randrange(10 ** 8)
+		nameNumber = add(plistMarker(5, len(name)) + name)
+		valueNumber = add("\x12" + struct.pack(">I", rnd.getrandbits(31)))
+		records.append(add(plistMarker(13, 3) + plistRefs([keys["$class"], keys["name"], keys["value"]]) + plistRefs([rnd.choice(classes), nameNumber, valueNumber])))
+	array = add(plistMarker(10, len(records)) + plistRefs(records))
+	top = add(plistMarker(13, 1) + plistRefs([keys["root"]]) + plistRefs([classes[0]]))
+	objects[0] = plistMarker(13, 4) + plistRefs([keys["$archiver"], keys["$version"], keys["$top"], keys["$objects"]]) + plistRefs([archiver, version, top, array])
+
+	return writeBinaryPlist(fileName, objects)
+
+# writes a binary plist of "depth" nested single element arrays and dicts, around the string "leaf"
+def writeDeepPlist(fileName, depth):
+	objects = []
+	for i in range(depth):
+		if (i % 2 == 0):
+			objects.append(plistMarker(10, 1) + plistRefs([i + 1]))
+		else:
+			objects.append(plistMarker(13, 1) + plistRefs([depth + 1, i + 1]))
+	objects.append(plistMarker(5, 4) + "leaf")
+	objects.append(plistMarker(5, 5) + "child")
+	return writeBinaryPlist(fileName, objects)
+
+# writes a synthetic NSKeyedArchiver archive whose root is a NSMutableArray of "count" HistoryItem
+# objects (url and title strings, visit count, NSDate, and a "parent" reference back to the root)
+def writeSyntheticArchive(fileName, count, seed=0):
+
+	rnd = random.Random(seed)
+	objects = [None] # object 0 is the plist root dict, written last
+	archived = [] # plist objects numbers of $objects
+
+	def add(data):
+		objects.append(data)
+		return len(objects) - 1
+
+	def string(value):
+		return add(plistMarker(5, len(value)) + value)
+
+	def uid(number):
+		return add("\x83" + struct.pack(">I", number))
+
+	def archive(data):
+		archived.append(add(data))
+		return len(archived) - 1
+
+	def dictionary(pairs):
+		return plistMarker(13, len(pairs)) + plistRefs([key for key, value in pairs]) + plistRefs([value for key, value in pairs])
+
+	keys = dict([(key, string(key)) for key in ["$archiver", "$version", "$top", "$objects", "$class", "$classname", "$classes", "root", "NS.objects", "NS.time", "url", "title", "visits", "date", "parent"]])
+
+	def classObject(names):
+		return archive(dictionary([(keys["$classname"], string(names[0])), (keys["$classes"], add(plistMarker(10, len(names)) + plistRefs([string(name) for name in names])))]))
+
+	archive(plistMarker(5, 5) + "$null")
+	rootNumber = len(archived)
+	archived.append(None) # the root array, written once the items are known
+	arrayClass = uid(classObject(["NSMutableArray", "NSArray", "NSObject"]))
+	itemClass = uid(classObject(["HistoryItem", "NSObject"]))
+	dateClass = uid(classObject(["NSDate", "NSObject"]))
+	parent = uid(rootNumber)
+
+	items = []
+	for i in range(count):
+		url = "http://www.example.com/%i" % i
+		url = uid(archive(plistMarker(5, len(url)) + url))
+		title = u"Page %06i" % rnd.randrange(10 ** 6)
+		title = uid(archive(plistMarker(6, len(title)) + title.encode("utf_16_be")))
+		date = uid(archive(dictionary([(keys["$class"], dateClass), (keys["NS.time"], add("\x23" + struct.pack(">d", rnd.uniform(3e8, 4e8))))])))
+		visits = add("\x12" + struct.pack(">I", rnd.randrange(1000)))
+		items.append(uid(archive(dictionary([(keys["$class"], itemClass), (keys["url"], url), (keys["title"], title), (keys["visits"], visits), (keys["date"], date), (keys["parent"], parent)]))))
+	archived[rootNumber] = add(dictionary([(keys["$class"], arrayClass), (keys["NS.objects"], add(plistMarker(10, len(items)) + plistRefs(items)))]))
+
+	top = add(dictionary([(keys["root"], uid(rootNumber))]))
+	objects[0] = dictionary([(keys["$archiver"], string("NSKeyedArchiver")), (keys["$version"], add("\x12" + struct.pack(">I", 100000))), (keys["$top"], top), (keys["$objects"], add(plistMarker(10, len(archived)) + plistRefs(archived)))])
+
+	return writeBinaryPlist(fileName, objects)
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# returns "count" file headers (8 kB, as read by magic.file) looking like the content of a backup
+def syntheticHeaders(count, seed=0):
+
+	rnd = random.Random(seed)
+
+	def randomBytes(length):
+		return "".join([chr(rnd.randrange(256)) for i in range(length)])
+
+	kinds = [
+		lambda: "SQLite format 3\x00" + randomBytes(8176),
+		lambda: "bplist00" + randomBytes(600),
+		lambda: "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<!DOCTYPE plist PUBLIC \"-//Apple//DTD PLIST 1.0//EN\">\n<plist version=\"1.0\"><dict/></plist>\n",
+		lambda: "\xff\xd8\xff\xe0\x00\x10JFIF\x00" + randomBytes(8181),
+		lambda: "\x89PNG\r\n\x1a\n" + randomBytes(8184),
+		lambda: "\x00\x00\x00\x1cftypM4A " + randomBytes(8180),
+		lambda: "PK\x03\x04" + randomBytes(2000),
+		lambda: "The contents of this file are plain text.\n" * 100,
+		lambda: randomBytes(8192),
+	]
+	return [rnd.choice(kinds)() for i in range(count)]
+
+# returns the best of "repeat" runs of function(*args)
+def timeit(function, args, repeat=3):
+	best = None
+	for i in range(repeat):
+		start = time.time()
+		function(*args)
+		elapsed = time.time() - start
+		if (best == None or elapsed < best):
+			best = elapsed
+	return best
+
+# returns the memory (bytes) held by "root" and by everything reachable from it through
+# containers and slotted objects, counting each object once
+def deepSizeOf(root):
+	seen = set()
+	total = 0
+	stack = [root]
+	while stack:
+		obj = stack.pop()
+		if id(obj) in seen:
+			continue
+		seen.add(id(obj))
+		total += sys.getsizeof(obj)
+		if isinstance(obj, dict):
+			stack.extend(obj.keys())
+			stack.extend(obj.values())
+		elif isinstance(obj, (list, tuple, set)):
+			stack.extend(obj)
+		elif hasattr(obj, "__slots__"):
+			stack.extend([getattr(obj, name) for name in obj.__slots__ if hasattr(obj, name)])
+	return total
+
+# returns (fileName, isTemporary) for the manifest to be parsed
+def manifestForBenchmark(args, count):
+	if (len(args) > 0):
+		return args[0], False
+	fileName = os.path.join(tempfile.mkdtemp(), "Manifest.mbdb")
+	print("Writing synthetic manifest with %i records to %s" % (count, fileName))
+	writeSyntheticMbdb(fileName, count)
+	return fileName, True
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+def benchMbdb(args):
+	"""mbdb [Manifest.mbdb]: compares the legacy and the struct based MBDB decoders"""
+
+	fileName, isTemporary = manifestForBenchmark(args, 100000)
+
+	legacy = mbdbdecoding.process_mbdb_file_legacy(fileName)
+	current = mbdbdecoding.process_mbdb_file(fileName)
+	if (legacy != dict((offset, record.todict()) for offset, record in current.items())):
+		print("ERROR: decoders disagree on %s" % fileName)
+		return 1
+	count = len(current)
+	del legacy, current
+
+	legacyTime = timeit(mbdbdecoding.process_mbdb_file_legacy, (fileName,))
+	currentTime = timeit(mbdbdecoding.process_mbdb_file, (fileName,))
+
+	print("Records: %i" % count)
+	print("legacy decoder:  %.3f s (%i records/s)" % (legacyTime, count / legacyTime))
+	print("struct decoder:  %.3f s (%i records/s)" % (currentTime, count / currentTime))
+	print("speedup:         %.2fx" % (legacyTime / currentTime))
+
+	if (isTemporary):
+		shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+def benchRecords(args):
+	"""records [Manifest.mbdb]: memory held by parsed records, dict vs ManifestRecord (500k synthetic records)"""
+
+	fileName, isTemporary = manifestForBenchmark(args, 500000)
+
+	gc.collect()
+	legacy = mbdbdecoding.process_mbdb_file_legacy(fileName)
+	count = len(legacy)
+	legacySize = deepSizeOf(legacy)
+	del legacy
+
+	gc.collect()
+	current = mbdbdecoding.process_mbdb_file(fileName)
+	currentSize = deepSizeOf(current)
+	del current
+
+	print("Records: %i" % count)
+	print("dict records:          %8.1f MB (%i bytes/record)" % (legacySize / 1048576.0, legacySize / count))
+	print("ManifestRecord:        %8.1f MB (%i bytes/record)" % (currentSize / 1048576.0, currentSize / count))
+	print("saved:                 %8.1f%%" % (100.0 * (legacySize - currentSize) / legacySize))
+
+	if (isTemporary):
+		shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+def benchMbdx(args):
+	"""mbdx [Manifest.mbdx]: compares the legacy and the bulk MBDX decoders (300k synthetic records)"""
+
+	if (len(args) > 0):
+		fileName, isTemporary = args[0], False
+	else:
+		fileName, isTemporary = os.path.join(tempfile.mkdtemp(), "Manifest.mbdx"), True
+		writeSyntheticMbdx(fileName, 300000)
+
+	legacy = mbdbdecoding.process_mbdx_file_legacy(fileName)
+	current = mbdbdecoding.process_mbdx_file(fileName)
+	if (legacy != dict(current.items())):
+		print("ERROR: decoders disagree on %s" % fileName)
+		return 1
+	count = len(current)
+	legacySize = deepSizeOf(legacy)
+	currentSize = deepSizeOf([current.table, current.offsets, current.records])
+	del legacy, current
+
+	legacyTime = timeit(mbdbdecoding.process_mbdx_file_legacy, (fileName,))
+	currentTime = timeit(mbdbdecoding.process_mbdx_file, (fileName,))
+
+	print("Records: %i" % count)
+	print("legacy decoder:  %.3f s, %8.1f MB" % (legacyTime, legacySize / 1048576.0))
+	print("bulk decoder:    %.3f s, %8.1f MB" % (currentTime, currentSize / 1048576.0))
+	print("speedup:         %.2fx" % (legacyTime / currentTime))
+
+	if (isTemporary):
+		shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+# hashes a chunk of fileID keys in a worker process (see benchFileIds)
+def sha1Chunk(keys):
+	return [hashlib.sha1(key).hexdigest() for key in keys]
+
+def benchFileIds(args):
+	"""fileids [Manifest.mbdb] [workers]: iOS 5+ fileID hashing, inline vs a process pool and the pickling it costs"""
+
+	fileName, isTemporary = manifestForBenchmark(args[:1], 300000)
+	workers = len(args) > 1 and int(args[1]) or multiprocessing.cpu_count()
+
+	records = list(mbdbdecoding.iter_mbdb_records(fileName))
+	keys = ["%s-%s" % (record['domain'], record['filename']) for record in records]
+	chunks = [keys[i:i + 4096] for i in range(0, len(keys), 4096)]
+	inline = [record['fileID'] for record in mbdbdecoding.iter_file_ids(records)]
+
+	pool = multiprocessing.Pool(workers)
+	try:
+		if (inline != sum(pool.map(sha1Chunk, chunks), [])):
+			print("ERROR: pooled fileIDs differ from inline ones on %s" % fileName)
+			return 1
+		pooledTime = timeit(lambda: pool.map(sha1Chunk, chunks), ())
+	finally:
+		pool.terminate()
+
+	parseTime = timeit(lambda: [record for record in mbdbdecoding.iter_mbdb_records(fileName)], ())
+	inlineTime = timeit(lambda: [record for record in mbdbdecoding.iter_file_ids(mbdbdecoding.iter_mbdb_records(fileName))], ())
+	hashTime = timeit(sha1Chunk, (keys,))
+	# what the parent alone spends handing keys out and reading digests back
+	pickledDigests = [cPickle.dumps(sha1Chunk(chunk), 2) for chunk in chunks]
+	pickleTime = timeit(lambda: ([cPickle.dumps(chunk, 2) for chunk in chunks], [cPickle.loads(digests) for digests in pickledDigests]), ())
+
+	print("Records: %i" % len(keys))
+	print("parse only:             %.3f s" % parseTime)
+	print("parse + inline hashing: %.3f s" % inlineTime)
+	print("hashing only, inline:   %.3f s" % hashTime)
+	print("hashing, %2i workers:    %.3f s" % (workers, pooledTime))
+	print("pickling in the parent: %.3f s (a pool saves at most hashing minus this)" % pickleTime)
+
+	if (isTemporary):
+		shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+def benchMagic(args):
+	"""magic [backup dir]: file type detection, compiled matcher vs test list (synthetic or backup file headers)"""
+
+	if (len(args) > 0):
+		headers = []
+		for name in sorted(os.listdir(args[0]))[:5000]:
+			fileName = os.path.join(args[0], name)
+			if (os.path.isfile(fileName)):
+				f = open(fileName, 'rb')
+				headers.append(f.read(8192))
+				f.close()
+	else:
+		headers = syntheticHeaders(2000)
+
+	legacy = [magic.whatis_legacy(data) for data in headers]
+	current = [magic.whatis(data) for data in headers]
+	if (legacy != current):
+		print("ERROR: matchers disagree on %i of %i files" % (len([i for i in range(len(legacy)) if legacy[i] != current[i]]), len(legacy)))
+		return 1
+
+	start = time.time()
+	magic.compiledMagic(magic.magicTests())
+	compileTime = time.time() - start
+
+	legacyTime = timeit(lambda: [magic.whatis_legacy(data) for data in headers], ())
+	currentTime = timeit(lambda: [magic.whatis(data) for data in headers], ())
+
+	print("Files: %i (%i magic tests)" % (len(headers), len(magic.magicTests())))
+	print("compile:          %.4f s" % compileTime)
+	print("test list:        %.3f s (%i files/s)" % (legacyTime, len(headers) / legacyTime))
+	print("compiled matcher: %.3f s (%i files/s)" % (currentTime, len(headers) / currentTime))
+	print("speedup:          %.2fx" % (legacyTime / currentTime))
+	return 0
+
+def benchClassify(args):
+	"""classify [backup dir] [workers]: magic.file on every file, serial vs magic.classify_many"""
+
+	if (len(args) > 0):
+		dirName, isTemporary = args[0], False
+	else:
+		dirName, isTemporary = tempfile.mkdtemp(), True
+		print("Writing 5000 synthetic backup files to %s" % dirName)
+		for i, data in enumerate(syntheticHeaders(5000)):
+			f = open(os.path.join(dirName, "%040x" % i), 'wb')
+			f.write(data)
+			f.close()
+	workers = len(args) > 1 and int(args[1]) or 8
+	paths = [os.path.join(dirName, name) for name in sorted(os.listdir(dirName))]
+	paths = [path for path in paths if os.path.isfile(path)]
+
+	serial = dict([(path, magic.file(path)) for path in paths])
+	if (serial != dict(magic.classify_many(paths, workers))):
+		print("ERROR: classify_many and magic.file disagree on %s" % dirName)
+		return 1
+
+	# a type cache knowing every file: classify_many reads nothing, serially
+	cache = typecache.TypeCache(len(paths))
+	if (serial != dict(magic.classify_many(paths, workers, cache=cache)) or serial != dict(magic.classify_many(paths, workers, cache=cache))):
+		print("ERROR: classify_many with a type cache and magic.file disagree on %s" % dirName)
+		return 1
+
+	# the page cache is warm for both runs: threads pay off when reads hit the disk
+	serialTime = timeit(lambda: [magic.file(path) for path in paths], ())
+	concurrentTime = timeit(lambda: list(magic.classify_many(paths, workers)), ())
+	cachedTime = timeit(lambda: list(magic.classify_many(paths, workers, cache=cache)), ())
+
+	print("Files: %i" % len(paths))
+	print("magic.file:               %.3f s (%i files/s)" % (serialTime, len(paths) / serialTime))
+	print("classify_many, %2i threads: %.3f s (%i files/s)" % (workers, concurrentTime, len(paths) / concurrentTime))
+	print("classify_many, warm cache: %.3f s (%i files/s)" % (cachedTime, len(paths) / cachedTime))
+
+	if (isTemporary):
+		shutil.rmtree(dirName)
+	return 0
+
+def benchStartup(args):
+	"""startup [runs]: cost of importing magic and of its first use, with and without the compiled table cache"""
+
+	runs = len(args) > 0 and int(args[0]) or 5
+	here = os.path.dirname(os.path.abspath(__file__))
+	script = "import time; start = time.time(); import magic; loaded = time.time(); magic.whatis('SQLite format 3'); print('%f %f' % (loaded - start, time.time() - loaded))"
+
+	# best of "runs" fresh interpreters (the interpreter startup itself is not counted)
+	def measure(cold):
+		best = None
+		for i in range(runs):
+			if (cold and os.path.exists(magic.cacheFileName())):
+				os.remove(magic.cacheFileName())
+			output = subprocess.Popen([sys.executable, "-c", script], cwd=here, stdout=subprocess.PIPE).communicate()[0]
+			times = tuple([float(value) for value in output.split()])
+			if (best == None or sum(times) < sum(best)):
+				best = times
+		return best
+
+	coldImport, coldUse = measure(True)
+	warmImport, warmUse = measure(False)
+
+	print("import magic:           %.2f ms" % (warmImport * 1000))
+	print("first use, no cache:    %.2f ms (%i magic tests built and compiled)" % (coldUse * 1000, len(magic.magicTests())))
+	print("first use, cached:      %.2f ms (%s)" % (warmUse * 1000, magic.cacheFileName()))
+	return 0
+
+def benchPlist(args):
+	"""plist [records|binary plist]: biplist.PlistReader, bulk offset table, shared objects, explicit stack and lazy containers (synthetic keyed archive with 100000 records)"""
+
+	if (len(args) > 0 and os.path.isfile(args[0])):
+		fileName, isTemporary = args[0], False
+	else:
+		count = len(args) > 0 and int(args[0]) or 100000
+		fileName, isTemporary = os.path.join(tempfile.mkdtemp(), "synthetic.plist"), True
+		print("Writing synthetic keyed archive with %i objects to %s" % (writeSyntheticPlist(fileName, count), fileName))
+
+	# recursive decoding (each container decodes its children through readObject), shared objects
+	class RecursiveReader(biplist.PlistReader):
+		def readObjectNumber(self, objectNumber):
+			if (objectNumber not in self.objects):
+				self.setCurrentOffsetToObjectNumber(objectNumber)
+				self.objects[objectNumber] = self.readObject()
+			return self.objects[objectNumber]
+
+	# recursive decoding, before object sharing: every reference decodes its object again
+	class UnsharedReader(biplist.PlistReader):
+		def readObjectNumber(self, objectNumber):
+			self.setCurrentOffsetToObjectNumber(objectNumber)
+			return self.readObject()
+
+	def parse(readerClass, lazy=False):
+		f = open(fileName, 'rb')
+		reader = readerClass(f, lazy=lazy)
+		result = reader.parse()
+		f.close()
+		return reader, result
+
+	# lazy reader: decodes only the path to the first leaf
+	def firstLeaf():
+		node = parse(biplist.PlistReader, True)[1]
+		while isinstance(node, (biplist.LazyDict, biplist.LazyArray)) and len(node) > 0:
+			node = isinstance(node, biplist.LazyDict) and node[sorted(node.keys())[0]] or node[0]
+		return node
+
+	reader, shared = parse(biplist.PlistReader)
+	for readerClass, lazy in [(RecursiveReader, False), (UnsharedReader, False), (biplist.PlistReader, True)]:
+		if (parse(readerClass, lazy)[1] != shared):
+			print("ERROR: %s%s objects differ for %s" % (readerClass.__name__, lazy and " (lazy)" or "", fileName))
+			return 1
+
+	trailer = reader.trailer
+	table = reader.contents[trailer.offsetTableOffset:trailer.offsetTableOffset + trailer.offsetSize * trailer.offsetCount]
+	size = trailer.offsetSize
+	singleTime = timeit(lambda: [reader.getSizedInteger(table[i:i + size], size) for i in range(0, len(table), size)], ())
+	bulkTime = timeit(reader.getSizedIntegers, (table, size, trailer.offsetCount))
+	unsharedTime = timeit(parse, (UnsharedReader,))
+	recursiveTime = timeit(parse, (RecursiveReader,))
+	sharedTime = timeit(parse, (biplist.PlistReader,))
+	lazyTime = timeit(firstLeaf, ())
+
+	print("Objects: %i (%i bytes), %i decoded" % (trailer.offsetCount, len(reader.contents), len(reader.objects)))
+	print("offset table, per entry: %.4f s" % singleTime)
+	print("offset table, bulk:      %.4f s" % bulkTime)
+	print("parse, unshared objects: %.3f s (%i objects/s)" % (unsharedTime, trailer.offsetCount / unsharedTime))
+	print("parse, recursive:        %.3f s (%i objects/s)" % (recursiveTime, trailer.offsetCount / recursiveTime))
+	print("parse, explicit stack:   %.3f s (%i objects/s)" % (sharedTime, trailer.offsetCount / sharedTime))
+	print("speedup:                 %.2fx (%.2fx over recursive)" % (unsharedTime / sharedTime, recursiveTime / sharedTime))
+	print("lazy, first leaf:        %.4f s" % lazyTime)
+
+	if (isTemporary):
+		shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+def benchPlistData(args):
+	"""plistdata [blobs] [MB per blob]: peak memory of reading a binary plist with large data values, read vs memory mapped"""
+
+	blobs = len(args) > 0 and int(args[0]) or 10
+	blobSize = (len(args) > 1 and int(args[1]) or 8) << 20
+	fileName = os.path.join(tempfile.mkdtemp(), "SuspendState.plist")
+
+	rnd = random.Random(0)
+	pattern = "".join([chr(rnd.randrange(256)) for i in range(1 << 16)])
+	documents = [{"SafariStateDocumentTitle": "Page %i" % i, "SafariStateDocumentThumbnail": biplist.Data("%08i" % i + pattern * (blobSize >> 16))} for i in range(blobs)]
+	biplist.writePlist({"SafariStateDocuments": documents}, fileName)
+	del documents
+	print("Synthetic plist: %i data values of %i MB, %.1f MB" % (blobs, blobSize >> 20, os.path.getsize(fileName) / 1048576.0))
+
+	# every run in a fresh interpreter, so that peak memory (ru_maxrss, kB on Linux) is its own
+	script = "import sys, time, resource, biplist; base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; start = time.time(); plist = biplist.readPlist(sys.argv[1], sys.argv[2] == 'mapped'); sizes = [len(d['SafariStateDocumentThumbnail']) for d in plist['SafariStateDocuments']]; elapsed = time.time() - start; print('%f %i' % (elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base))"
+	here = os.path.dirname(os.path.abspath(__file__))
+	for mode in ["read", "mapped"]:
+		output = subprocess.Popen([sys.executable, "-c", script, fileName, mode], cwd=here, stdout=subprocess.PIPE).communicate()[0]
+		elapsed, peak = output.split()
+		print("%-7s %.3f s, peak memory +%.1f MB" % (mode + ":", float(elapsed), int(peak) / 1024.0))
+
+	shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+def benchPlistDepth(args):
+	"""plistdepth [depth]: decoding of deeply nested binary plists (default 100000 levels, far beyond the recursion limit)"""
+
+	depth = len(args) > 0 and int(args[0]) or 100000
+	fileName = os.path.join(tempfile.mkdtemp(), "deep.plist")
+	writeDeepPlist(fileName, depth)
+
+	start = time.time()
+	root = biplist.readPlist(fileName)
+	elapsed = time.time() - start
+
+	# walk down (comparisons and repr would recurse)
+	node, levels = root, 0
+	while isinstance(node, (list, dict)):
+		node = isinstance(node, list) and node[0] or node["child"]
+		levels += 1
+	if (levels != depth or node != "leaf"):
+		print("ERROR: found %r after %i of %i levels" % (node, levels, depth))
+		return 1
+
+	print("Depth: %i (recursion limit %i)" % (depth, sys.getrecursionlimit()))
+	print("parse: %.3f s (%i levels/s)" % (elapsed, depth / elapsed))
+
+	shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+def benchPlistXml(args):
+	"""plistxml [records|binary plist]: plistutils.readPlistToXml, native conversion vs the IPBAplutil.pl subprocess (synthetic history with 2000 records)"""
+
+	workDir = tempfile.mkdtemp()
+	if (len(args) > 0 and os.path.isfile(args[0])):
+		fileName = args[0]
+	else:
+		# the Perl script reads 1 and 2 byte object references only: keep below 65536 objects
+		count = len(args) > 0 and int(args[0]) or 2000
+		rnd = random.Random(0)
+		records = []
+		for i in range(count):
+			records.append({
+				"": "http://www.example.com/page%i?a=1&b=<%i>" % (i, rnd.randrange(1000)),
+				"title": u"Page \xe9 %i" % rnd.randrange(10 ** 6),
+				"visitCount": rnd.randrange(1000),
+				"lastVisitedDate": "%.1f" % rnd.uniform(3e8, 4e8),
+				"rank": rnd.random(),
+				"visited": datetime.datetime(2013, 1, 1) + datetime.timedelta(seconds=rnd.randrange(10 ** 7)),
+				"D": [rnd.randrange(10) for j in range(3)],
+				"icon": biplist.Data("".join([chr(rnd.randrange(256)) for j in range(rnd.randrange(100))])),
+			})
+		fileName = os.path.join(workDir, "History.plist")
+		biplist.writePlist({"WebHistoryFileVersion": 1, "WebHistoryDates": records}, fileName)
+	print("Plist: %s (%i bytes)" % (fileName, os.path.getsize(fileName)))
+
+	native = plistutils.binaryPlistToXml(fileName)
+
+	# the same conversion from 4 threads at once
+	results = []
+	threads = [threading.Thread(target=lambda: results.append(plistutils.binaryPlistToXml(fileName))) for i in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	if (results != [native] * 4):
+		print("ERROR: concurrent conversions differ")
+		return 1
+
+	# the replaced path: perl writes out.plist in its working dir, parsed with minidom
+	script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "IPBAplutil.pl")
+	def perlToXml():
+		if (subprocess.call(["perl", script, fileName], cwd=workDir) != 0):
+			raise OSError("IPBAplutil.pl failed on %s" % fileName)
+		return xml.dom.minidom.parse(os.path.join(workDir, "out.plist"))
+
+	nativeTime = timeit(lambda: xml.dom.minidom.parseString(plistutils.binaryPlistToXml(fileName)), ())
+	print("native:        %.3f s" % nativeTime)
+
+	try:
+		perlToXml()
+	except OSError:
+		print("perl path:     not available (%s)" % sys.exc_info()[1])
+	else:
+		perlText = open(os.path.join(workDir, "out.plist"), 'rb').read()
+		if (perlText != native):
+			print("ERROR: native XML differs from IPBAplutil.pl output")
+			return 1
+		perlTime = timeit(perlToXml, ())
+		print("perl path:     %.3f s (same XML)" % perlTime)
+		print("speedup:       %.2fx" % (perlTime / nativeTime))
+
+	shutil.rmtree(workDir)
+	return 0
+
+def benchPlistIter(args):
+	"""plistiter [records]: large XML plist, plistlib.readPlist vs plistutils.iterXmlPlist (time to first record, total time, peak memory; default 200000 records)"""
+
+	count = len(args) > 0 and int(args[0]) or 200000
+	fileName = os.path.join(tempfile.mkdtemp(), "History.plist")
+
+	rnd = random.Random(0)
+	out = open(fileName, 'wb')
+	out.write('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n')
+	out.write('<plist version="1.0">\n<dict>\n\t<key>WebHistoryFileVersion</key>\n\t<integer>1</integer>\n\t<key>WebHistoryDates</key>\n\t<array>\n')
+	for i in range(count):
+		out.write("\t\t<dict>\n\t\t\t<key></key>\n\t\t\t<string>http://www.example.com/page%i?q=%i</string>\n" % (i, rnd.randrange(10 ** 6)))
+		out.write("\t\t\t<key>title</key>\n\t\t\t<string>Page %i</string>\n" % rnd.randrange(10 ** 6))
+		out.write("\t\t\t<key>lastVisitedDate</key>\n\t\t\t<string>%.1f</string>\n" % rnd.uniform(3e8, 4e8))
+		out.write("\t\t\t<key>visitCount</key>\n\t\t\t<integer>%i</integer>\n\t\t</dict>\n" % rnd.randrange(1000))
+	out.write("\t</array>\n</dict>\n</plist>\n")
+	out.close()
+	print("Synthetic XML plist: %i records, %.1f MB" % (count, os.path.getsize(fileName) / 1048576.0))
+
+	if (list(itertools.islice(plistutils.iterXmlPlist(fileName, "WebHistoryDates"), 1000)) != plistlib.readPlist(fileName)["WebHistoryDates"][:1000]):
+		print("ERROR: iterXmlPlist and plistlib disagree on %s" % fileName)
+		return 1
+
+	# every run in a fresh interpreter, so that peak memory (ru_maxrss, kB on Linux) is its own
+	script = "import sys, time, resource, plistlib, plistutils; base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; start = time.time()\n"
+	script += "if sys.argv[2] == 'plistlib':\n records = iter(plistlib.readPlist(sys.argv[1])['WebHistoryDates'])\n"
+	script += "else:\n records = plistutils.iterXmlPlist(sys.argv[1], 'WebHistoryDates')\n"
+	script += "next(records); first = time.time() - start\nfor record in records: pass\n"
+	script += "print('%f %f %i' % (first, time.time() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base))\n"
+	here = os.path.dirname(os.path.abspath(__file__))
+	for mode in ["plistlib", "iterXmlPlist"]:
+		output = subprocess.Popen([sys.executable, "-c", script, fileName, mode], cwd=here, stdout=subprocess.PIPE).communicate()[0]
+		first, total, peak = output.split()
+		print("%-13s first record %.4f s, all records %.2f s, peak memory +%.1f MB" % (mode + ":", float(first), float(total), int(peak) / 1024.0))
+
+	shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+def benchArchive(args):
+	"""archive [records]: keyedarchive, root object and full traversal of a NSKeyedArchiver file, lazy vs eager (single pass) archive (default 300000 records)"""
+
+	count = len(args) > 0 and int(args[0]) or 300000
+	fileName = os.path.join(tempfile.mkdtemp(), "synthetic.plist")
+	objects = writeSyntheticArchive(fileName, count)
+	print("Synthetic keyed archive: %i records, %i objects, %.1f MB" % (count, objects, os.path.getsize(fileName) / 1048576.0))
+
+	def eager():
+		plistutils.plistCache.clear()
+		return keyedarchive.readArchive(fileName, eager=True)
+
+	def lazy():
+		plistutils.plistCache.clear()
+		return keyedarchive.readArchive(fileName)
+
+	# follows every field of every record (the "parent" references come back to the root)
+	def traverse(archive):
+		root = archive.root
+		for item in root:
+			if (item["parent"] is not root):
+				raise keyedarchive.KeyedArchiveException("parent of %r is not the root" % item)
+			[item[key] for key in item.keys()]
+		return archive
+
+	archive = traverse(lazy())
+	reference = traverse(eager())
+	fields = lambda archive: [sorted([(key, item[key]) for key in item.keys() if key != "parent"]) for item in archive.root[:1000]]
+	if (fields(archive) != fields(reference)):
+		print("ERROR: lazy and eager archives differ for %s" % fileName)
+		return 1
+
+	eagerRoot = timeit(lambda: eager().root, ())
+	lazyRoot = timeit(lambda: lazy().root, ())
+	lazyFirst = timeit(lambda: lazy().root[0]["title"], ())
+	eagerAll = timeit(lambda: traverse(eager()), ())
+	lazyAll = timeit(lambda: traverse(lazy()), ())
+
+	print("UIDs resolved: %i (%i class objects), each once" % (len(archive.resolved), len(archive.classes)))
+	print("eager, root:              %.3f s" % eagerRoot)
+	print("lazy, root:               %.3f s" % lazyRoot)
+	print("lazy, first record:       %.4f s" % lazyFirst)
+	print("eager, traversal:         %.3f s (%i objects/s)" % (eagerAll, objects / eagerAll))
+	print("lazy, traversal:          %.3f s (%i objects/s)" % (lazyAll, objects / lazyAll))
+
+	plistutils.plistCache.clear()
+	shutil.rmtree(os.path.dirname(fileName))
+	return 0
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+benchmarks = {
+	"mbdb": benchMbdb,
+	"records": benchRecords,
+	"mbdx": benchMbdx,
+	"fileids": benchFileIds,
+	"magic": benchMagic,
+	"classify": benchClassify,
+	"startup": benchStartup,
+	"plist": benchPlist,
+	"plistdata": benchPlistData,
+	"plistdepth": benchPlistDepth,
+	"plistxml": benchPlistXml,
+	"plistiter": benchPlistIter,
+	"archive": benchArchive,
+}
+
+if __name__ == "__main__":
+
+	if (len(sys.argv) < 2 or sys.argv[1] not in benchmarks):
+		print("Usage: python benchmarks.py <benchmark> [args]\n")
+		for name in sorted(benchmarks.keys()):
+			print("  %s" % benchmarks[name].__doc__)
+		sys.exit(1)
+
+	sys.exit(benchmarks[sys.argv[1]](sys.argv[2:]))
@@ -15,6 +15,14 @@ Data object. The value must be a string.
 
 Date values can only be datetime.datetime objects.
 
+Binary plists read with mapped=True are memory mapped instead of read, and
+their NSData/CFData values are returned as DataView objects: windows on the
+mapping that are copied into Data only when materialized (data, str/bytes).
+
+With lazy=True arrays and dicts of binary plists are returned as LazyArray
+and LazyDict: read-only proxies that decode a child from the object table
+the first time it is accessed.
+
 The exceptions InvalidPlistException and NotBinaryPlistException may be 
 thrown to indicate that the data cannot be serialized or deserialized as
 a binary plist.
@@ -47,22 +55,30 @@ Plist parsing example:
 import sys
 from collections import namedtuple
 import calendar
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:
+    from collections import Mapping, Sequence
 import datetime
 import math
+import mmap
 import plistlib
-from struct import pack, unpack
+from struct import pack, unpack, unpack_from
 import sys
 import time
 
 import six
 
 __all__ = [
-    'Uid', 'Data', 'readPlist', 'writePlist', 'readPlistFromString',
+    'Uid', 'Data', 'DataView', 'LazyArray', 'LazyDict', 'readPlist', 'writePlist', 'readPlistFromString',
     'writePlistToString', 'InvalidPlistException', 'NotBinaryPlistException'
 ]
 
 apple_reference_date_offset = 978307200
 
+# struct formats of the unsigned integers in offset and reference tables
+sized_integer_formats = {1: 'B', 2: 'H', 4: 'L', 8: 'Q'}
+
 class Uid(int):
     """Wrapper around integers for representing UID values. This
        is used in keyed archiving."""
@@ -73,6 +89,118 @@ class Data(six.binary_type):
     """Wrapper around str types for representing Data values."""
     pass
 
+class DataView(object):
+    """Data value of a memory mapped plist, copied only when materialized."""
+    __slots__ = ('source', 'offset', 'length')
+
+    def __init__(self, source, offset, length):
+        self.source = source
+        self.offset = offset
+        self.length = length
+
+    @property
+    def data(self):
+        """The value as a Data object (a copy)."""
+        return Data(self.source[self.offset:self.offset+self.length])
+
+    def view(self):
+        """Zero copy buffer over the value (buffer on Python 2, memoryview on 3)."""
+        if six.PY3:
+            return memoryview(self.source)[self.offset:self.offset+self.length]
+        return buffer(self.source, self.offset, self.length)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        # slices copy just the requested part
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step == 1:
+                return self.source[self.offset+start:self.offset+max(start, stop)]
+            return self.data[key]
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("DataView index out of range")
+        return self.source[self.offset+key]
+
+    def __bytes__(self):
+        return self.data
+
+    if not six.PY3:
+        __str__ = __bytes__
+
+    def __eq__(self, other):
+        if isinstance(other, DataView):
+            other = other.data
+        return self.data == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.data)
+
+    def __repr__(self):
+        return "DataView(%d bytes at offset %d)" % (self.length, self.offset)
+
+class LazyArray(Sequence):
+    """Array of a lazily read plist: elements are decoded when accessed."""
+
+    def __init__(self, reader, refs):
+        self.reader = reader
+        self.refs = refs
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.reader.readObjectNumber(ref) for ref in self.refs[index]]
+        return self.reader.readObjectNumber(self.refs[index])
+
+    def __iter__(self):
+        for ref in self.refs:
+            yield self.reader.readObjectNumber(ref)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, LazyArray)):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "LazyArray(%d elements)" % len(self.refs)
+
+class LazyDict(Mapping):
+    """Dict of a lazily read plist: keys are decoded with the dict, values
+       when accessed."""
+
+    def __init__(self, reader, refs):
+        self.reader = reader
+        self.refs = refs
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, key):
+        return self.reader.readObjectNumber(self.refs[key])
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __contains__(self, key):
+        return key in self.refs
+
+    def __repr__(self):
+        return "LazyDict(%r)" % list(self.refs.keys())
+
 class InvalidPlistException(Exception):
     """Raised when the plist is incorrectly formatted."""
     pass
@@ -81,7 +209,7 @@ class NotBinaryPlistException(Exception):
     """Raised when a binary plist was expected but not encountered."""
     pass
 
-def readPlist(pathOrFile):
+def readPlist(pathOrFile, mapped=False, lazy=False):
     """Raises NotBinaryPlistException, InvalidPlistException"""
     didOpen = False
     result = None
@@ -89,7 +217,7 @@ def readPlist(pathOrFile):
         pathOrFile = open(pathOrFile, 'rb')
         didOpen = True
     try:
-        reader = PlistReader(pathOrFile)
+        reader = PlistReader(pathOrFile, mapped, lazy)
         result = reader.parse()
     except NotBinaryPlistException as e:
         try:
@@ -103,6 +231,12 @@ def readPlist(pathOrFile):
     return result
 
 def wrapDataObject(o, for_binary=False):
+    if isinstance(o, DataView):
+        o = o.data
+    elif isinstance(o, LazyArray):
+        o = list(o)
+    elif isinstance(o, LazyDict):
+        o = dict(o)
     if isinstance(o, Data) and not for_binary:
         o = plistlib.Data(o)
     elif isinstance(o, plistlib.Data) and for_binary:
@@ -164,13 +298,20 @@ class PlistReader(object):
     file = None
     contents = ''
     offsets = None
+    objects = None
     trailer = None
     currentOffset = 0
+    mapped = False
+    lazy = False
     
-    def __init__(self, fileOrStream):
-        """Raises NotBinaryPlistException."""
+    def __init__(self, fileOrStream, mapped=False, lazy=False):
+        """Raises NotBinaryPlistException. With mapped=True a real file is
+           memory mapped and its data values are returned as DataView; with
+           lazy=True arrays and dicts are returned as LazyArray and LazyDict."""
         self.reset()
         self.file = fileOrStream
+        self.mapped = mapped
+        self.lazy = lazy
     
     def parse(self):
         return self.readRoot()
@@ -179,6 +320,7 @@ class PlistReader(object):
         self.trailer = None
         self.contents = ''
         self.offsets = []
+        self.objects = {}
         self.currentOffset = 0
     
     def readRoot(self):
@@ -188,7 +330,15 @@ class PlistReader(object):
         if not is_stream_binary_plist(self.file):
             raise NotBinaryPlistException()
         self.file.seek(0)
-        self.contents = self.file.read()
+        self.contents = None
+        if self.mapped:
+            try:
+                self.contents = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, EnvironmentError, ValueError):
+                # not a real file (streams have no fileno)
+                pass
+        if self.contents is None:
+            self.contents = self.file.read()
         if len(self.contents) < 32:
             raise InvalidPlistException("File is too short.")
         trailerContents = self.contents[-32:]
@@ -197,15 +347,8 @@ class PlistReader(object):
             offset_size = self.trailer.offsetSize * self.trailer.offsetCount
             offset = self.trailer.offsetTableOffset
             offset_contents = self.contents[offset:offset+offset_size]
-            offset_i = 0
-            while offset_i < self.trailer.offsetCount:
-                begin = self.trailer.offsetSize*offset_i
-                tmp_contents = offset_contents[begin:begin+self.trailer.offsetSize]
-                tmp_sized = self.getSizedInteger(tmp_contents, self.trailer.offsetSize)
-                self.offsets.append(tmp_sized)
-                offset_i += 1
-            self.setCurrentOffsetToObjectNumber(self.trailer.topLevelObjectNumber)
-            result = self.readObject()
+            self.offsets = self.getSizedIntegers(offset_contents, self.trailer.offsetSize, self.trailer.offsetCount)
+            result = self.readObjectNumber(self.trailer.topLevelObjectNumber)
         except TypeError as e:
             raise InvalidPlistException(e)
         return result
@@ -213,73 +356,134 @@ class PlistReader(object):
     def setCurrentOffsetToObjectNumber(self, objectNumber):
         self.currentOffset = self.offsets[objectNumber]
     
+    def readObjectNumber(self, objectNumber):
+        """Decodes object objectNumber. Immutable objects referenced more
+           than once (keys, class names of keyed archives) are decoded the
+           first time and then shared; arrays, sets and dicts are built
+           again for every reference, so that changing one does not change
+           the others. They are filled from an explicit stack instead of
+           recursion, so nesting is not limited by the recursion limit."""
+        objects = self.objects
+        if objectNumber in objects:
+            return objects[objectNumber]
+        result = self.readObjectOrContainer(objectNumber)
+        if result.__class__ is not PendingContainer:
+            objects[objectNumber] = result
+            return result
+
+        stack = [result]
+        pending = set([objectNumber])
+        readObjectOrContainer = self.readObjectOrContainer
+        while True:
+            container = stack[-1]
+            append = container.values.append
+            # decode the children of the innermost container, descending into
+            # child containers as they are found
+            for ref in container.remaining:
+                if ref in objects:
+                    append(objects[ref])
+                    continue
+                if ref in pending:
+                    raise InvalidPlistException("Object %d contains itself." % ref)
+                child = readObjectOrContainer(ref)
+                if child.__class__ is PendingContainer:
+                    break
+                objects[ref] = child
+                append(child)
+            else:
+                stack.pop()
+                pending.discard(container.objectNumber)
+                result = container.value()
+                if not stack:
+                    return result
+                stack[-1].values.append(result)
+                continue
+            stack.append(child)
+            pending.add(ref)
+    
+    def readObjectOrContainer(self, objectNumber):
+        """Reads object objectNumber, except for the children of arrays,
+           sets and dicts: these are returned as a PendingContainer (unless
+           the reader is lazy)."""
+        offset = self.offsets[objectNumber]
+        marker = byte_value(self.contents[offset])
+        format = marker >> 4
+        self.currentOffset = offset + 1
+        if format in container_formats and not self.lazy:
+            count = self.readLength(marker & 0x0f)
+            if format == 0b1101:
+                count *= 2 # key refs, then value refs
+            return PendingContainer(objectNumber, format, self.readRefs(count))
+        return self.objectReaders[format](self, marker & 0x0f)
+    
     def readObject(self):
-        result = None
-        tmp_byte = self.contents[self.currentOffset:self.currentOffset+1]
-        marker_byte = unpack("!B", tmp_byte)[0]
-        format = (marker_byte >> 4) & 0x0f
-        extra = marker_byte & 0x0f
+        """Reads the object at currentOffset (an array, set or dict with
+           all its children)."""
+        marker = byte_value(self.contents[self.currentOffset])
         self.currentOffset += 1
-        
-        def proc_extra(extra):
-            if extra == 0b1111:
-                #self.currentOffset += 1
-                extra = self.readObject()
-            return extra
-        
+        return self.objectReaders[marker >> 4](self, marker & 0x0f)
+    
+    def readLength(self, extra):
+        # lengths from 15 on follow the marker as an int object
+        if extra == 0b1111:
+            extra = self.readObject()
+        return extra
+    
+    # readers of the object types, indexed by the high nibble of the marker
+    # byte (see objectReaders) and called with its low nibble
+    
+    def readSingleton(self, extra):
         # bool, null, or fill byte
-        if format == 0b0000:
-            if extra == 0b0000:
-                result = None
-            elif extra == 0b1000:
-                result = False
-            elif extra == 0b1001:
-                result = True
-            elif extra == 0b1111:
-                pass # fill byte
-            else:
-                raise InvalidPlistException("Invalid object found at offset: %d" % (self.currentOffset - 1))
-        # int
-        elif format == 0b0001:
-            extra = proc_extra(extra)
-            result = self.readInteger(pow(2, extra))
-        # real
-        elif format == 0b0010:
-            extra = proc_extra(extra)
-            result = self.readReal(extra)
-        # date
-        elif format == 0b0011 and extra == 0b0011:
-            result = self.readDate()
-        # data
-        elif format == 0b0100:
-            extra = proc_extra(extra)
-            result = self.readData(extra)
-        # ascii string
-        elif format == 0b0101:
-            extra = proc_extra(extra)
-            result = self.readAsciiString(extra)
-        # Unicode string
-        elif format == 0b0110:
-            extra = proc_extra(extra)
-            result = self.readUnicode(extra)
-        # uid
-        elif format == 0b1000:
-            result = self.readUid(extra)
-        # array
-        elif format == 0b1010:
-            extra = proc_extra(extra)
-            result = self.readArray(extra)
-        # set
-        elif format == 0b1100:
-            extra = proc_extra(extra)
-            result = set(self.readArray(extra))
-        # dict
-        elif format == 0b1101:
-            extra = proc_extra(extra)
-            result = self.readDict(extra)
-        else:    
-            raise InvalidPlistException("Invalid object found: {format: %s, extra: %s}" % (bin(format), bin(extra)))
-        return result
+        if extra == 0b0000:
+            return None
+        elif extra == 0b1000:
+            return False
+        elif extra == 0b1001:
+            return True
+        elif extra == 0b1111:
+            return None # fill byte
+        raise InvalidPlistException("Invalid object found at offset: %d" % (self.currentOffset - 1))
+    
+    def readIntegerObject(self, extra):
+        if extra in integer_object_formats:
+            offset = self.currentOffset
+            self.currentOffset = offset + (1 << extra)
+            return unpack_from(integer_object_formats[extra], self.contents, offset)[0]
+        return self.readInteger(pow(2, self.readLength(extra)))
+    
+    def readRealObject(self, extra):
+        return self.readReal(self.readLength(extra))
+    
+    def readDateObject(self, extra):
+        if extra != 0b0011:
+            self.readInvalid(extra)
+        return self.readDate()
+    
+    def readDataObject(self, extra):
+        return self.readData(self.readLength(extra))
+    
+    def readAsciiStringObject(self, extra):
+        if extra == 0b1111:
+            extra = self.readObject()
+        offset = self.currentOffset
+        self.currentOffset = offset + extra
+        return self.contents[offset:offset+extra]
+    
+    def readUnicodeObject(self, extra):
+        return self.readUnicode(self.readLength(extra))
+    
+    def readArrayObject(self, extra):
+        return self.readArray(self.readLength(extra))
+    
+    def readSetObject(self, extra):
+        return set(self.readArray(self.readLength(extra)))
+    
+    def readDictObject(self, extra):
+        return self.readDict(self.readLength(extra))
+    
+    def readInvalid(self, extra):
+        marker = six.indexbytes(self.contents, self.currentOffset - 1)
+        raise InvalidPlistException("Invalid object found: {format: %s, extra: %s}" % (bin(marker >> 4), bin(extra)))
     
     def readInteger(self, bytes):
         result = 0
@@ -301,41 +505,28 @@ class PlistReader(object):
             raise InvalidPlistException("Unknown real of length %d bytes" % to_read)
         return result
     
-    def readRefs(self, count):    
-        refs = []
-        i = 0
-        while i < count:
-            fragment = self.contents[self.currentOffset:self.currentOffset+self.trailer.objectRefSize]
-            ref = self.getSizedInteger(fragment, len(fragment))
-            refs.append(ref)
-            self.currentOffset += self.trailer.objectRefSize
-            i += 1
-        return refs
+    def readRefs(self, count):
+        size = self.trailer.objectRefSize
+        fragment = self.contents[self.currentOffset:self.currentOffset+size*count]
+        self.currentOffset += size*count
+        return self.getSizedIntegers(fragment, size, count)
     
     def readArray(self, count):
-        result = []
-        values = self.readRefs(count)
-        i = 0
-        while i < len(values):
-            self.setCurrentOffsetToObjectNumber(values[i])
-            value = self.readObject()
-            result.append(value)
-            i += 1
-        return result
+        refs = self.readRefs(count)
+        if self.lazy:
+            return LazyArray(self, refs)
+        readObjectNumber = self.readObjectNumber
+        return [readObjectNumber(ref) for ref in refs]
     
     def readDict(self, count):
-        result = {}
+        readObjectNumber = self.readObjectNumber
         keys = self.readRefs(count)
         values = self.readRefs(count)
-        i = 0
-        while i < len(keys):
-            self.setCurrentOffsetToObjectNumber(keys[i])
-            key = self.readObject()
-            self.setCurrentOffsetToObjectNumber(values[i])
-            value = self.readObject()
-            result[key] = value
-            i += 1
-        return result
+        if self.lazy:
+            # keys are mostly shared strings, already decoded
+            objects = self.objects
+            return LazyDict(self, dict([(objects[key] if key in objects else readObjectNumber(key), value) for key, value in zip(keys, values)]))
+        return dict([(readObjectNumber(keys[i]), readObjectNumber(values[i])) for i in range(count)])
     
     def readAsciiString(self, length):
         result = unpack("!%ds" % length, self.contents[self.currentOffset:self.currentOffset+length])[0]
@@ -357,12 +548,20 @@ class PlistReader(object):
         return result
     
     def readData(self, length):
-        result = self.contents[self.currentOffset:self.currentOffset+length]
+        if isinstance(self.contents, mmap.mmap):
+            result = DataView(self.contents, self.currentOffset, length)
+        else:
+            result = Data(self.contents[self.currentOffset:self.currentOffset+length])
         self.currentOffset += length
-        return Data(result)
+        return result
     
     def readUid(self, length):
-        return Uid(self.readInteger(length+1))
+        size = length + 1
+        if size in uid_formats:
+            offset = self.currentOffset
+            self.currentOffset = offset + size
+            return Uid(unpack_from(uid_formats[size], self.contents, offset)[0])
+        return Uid(self.readInteger(size))
     
     def getSizedInteger(self, data, bytes):
         result = 0
@@ -378,6 +577,58 @@ class PlistReader(object):
         else:
             raise InvalidPlistException("Encountered integer longer than 8 bytes.")
         return result
+    
+    def getSizedIntegers(self, data, bytes, count):
+        """Decodes a table of count unsigned integers (offsets or object
+           references) in one go."""
+        if len(data) != bytes*count:
+            raise InvalidPlistException("Table of %d integers truncated at %d bytes." % (count, len(data)))
+        if bytes in sized_integer_formats:
+            return list(unpack('>%d%s' % (count, sized_integer_formats[bytes]), data))
+        elif 0 < bytes < 8:
+            # 3, 5, 6 and 7 byte tables are valid too (big offset tables use 3)
+            padded = six.b('').join([six.b('\0' * (8 - bytes)) + data[i:i+bytes] for i in range(0, len(data), bytes)])
+            return list(unpack('>%dQ' % count, padded))
+        else:
+            raise InvalidPlistException("Encountered integer longer than 8 bytes.")
+
+PlistReader.objectReaders = [
+    PlistReader.readSingleton, PlistReader.readIntegerObject, PlistReader.readRealObject, PlistReader.readDateObject,
+    PlistReader.readDataObject, PlistReader.readAsciiStringObject, PlistReader.readUnicodeObject, PlistReader.readInvalid,
+    PlistReader.readUid, PlistReader.readInvalid, PlistReader.readArrayObject, PlistReader.readInvalid,
+    PlistReader.readSetObject, PlistReader.readDictObject, PlistReader.readInvalid, PlistReader.readInvalid,
+]
+
+# formats of arrays, sets and dicts
+container_formats = frozenset([0b1010, 0b1100, 0b1101])
+
+# struct formats of int objects of 1, 2, 4 and 8 bytes, by marker low nibble
+integer_object_formats = {0: '>B', 1: '>H', 2: '>L', 3: '>q'}
+
+# struct formats of UIDs of 1, 2, 4 and 8 bytes, by size
+uid_formats = {1: '>B', 2: '>H', 4: '>L', 8: '>q'}
+
+# value of a byte taken from a string (or mmap) by index
+byte_value = int if six.PY3 else ord
+
+class PendingContainer(object):
+    """Array, set or dict whose children are being decoded by
+       PlistReader.readObjectNumber."""
+    __slots__ = ('objectNumber', 'format', 'remaining', 'values')
+
+    def __init__(self, objectNumber, format, refs):
+        self.objectNumber = objectNumber
+        self.format = format
+        self.remaining = iter(refs)
+        self.values = []
+
+    def value(self):
+        if self.format == 0b1010:
+            return self.values
+        elif self.format == 0b1100:
+            return set(self.values)
+        count = len(self.values) // 2
+        return dict(zip(self.values[:count], self.values[count:]))
 
 class HashableWrapper(object):
     def __init__(self, value):
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+'''
+ Analyzer for iPhone backup made by Apple iTunes
+
+ (C)opyright 2013 Mario Piccinelli <mario.piccinelli@gmail.com>
+ Released under MIT licence
+
+ indexcache keeps the backup index database (tables "indice" and "properties")
+ on disk, so that reopening a backup whose manifest did not change skips the
+ whole manifest parsing.
+
+ Cache files are named after a fingerprint of Manifest.mbdb/Manifest.mbdx
+ (size, mtime and SHA1 of the content) and stamped with SCHEMA_VERSION; a cache
+ file is used only if its build was completed (see markComplete).
+
+'''
+
+import os, sys, hashlib, sqlite3, glob, tempfile
+
+# bump whenever the layout of the index database changes
+SCHEMA_VERSION = 3
+
+MANIFEST_FILES = ["Manifest.mbdb", "Manifest.mbdx"]
+
+# prefix of the index files built in the temp dir when the cache dir is not writable
+TEMPORARY_PREFIX = "ipba2-index-"
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# directory holding the cache files (IPBA2_CACHE_DIR overrides the default)
+def cacheDir():
+	path = os.environ.get("IPBA2_CACHE_DIR")
+	if (not path):
+		path = os.path.join(os.path.expanduser("~"), ".ipba2", "cache")
+	return path
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# fingerprint (hex string) of the manifest files found in the backup dir
+def manifestFingerprint(backup_path):
+	fingerprint = hashlib.sha1("ipba2-index-%i" % SCHEMA_VERSION)
+	for name in MANIFEST_FILES:
+		fileName = os.path.join(backup_path, name)
+		if (not os.path.exists(fileName)):
+			continue
+		info = os.stat(fileName)
+		fingerprint.update("%s:%i:%i:" % (name, info.st_size, int(info.st_mtime)))
+		f = open(fileName, 'rb')
+		while True:
+			block = f.read(1 << 20)
+			if (not block):
+				break
+			fingerprint.update(block)
+		f.close()
+	return fingerprint.hexdigest()
+
+def cacheFileName(fingerprint):
+	return os.path.join(cacheDir(), "%s.sqlite" % fingerprint)
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# returns the cache file for the backup if it is complete and up to date, None otherwise
+def findIndex(backup_path, fingerprint=None):
+
+	if (fingerprint == None):
+		fingerprint = manifestFingerprint(backup_path)
+	fileName = cacheFileName(fingerprint)
+	if (not os.path.exists(fileName)):
+		return None
+
+	try:
+		database = sqlite3.connect(fileName)
+		try:
+			version = database.execute("PRAGMA user_version").fetchone()[0]
+			info = database.execute("SELECT fingerprint, complete FROM cache_info").fetchone()
+		finally:
+			database.close()
+	except sqlite3.Error:
+		return None
+
+	if (version != SCHEMA_VERSION or info == None):
+		return None
+	if (info[0] != fingerprint or info[1] != 1):
+		return None
+	return fileName
+
+# opens the index database for the backup dir ("fingerprint" saves hashing the manifest again,
+# if the caller already has it).
+# Returns (database, complete): if complete is False the database is empty and must be
+# populated by the caller, which then calls markComplete(). If the cache dir is not
+# writable the database is built in a temporary file (see isTemporary).
+def openIndex(backup_path, fingerprint=None):
+
+	if (fingerprint == None):
+		fingerprint = manifestFingerprint(backup_path)
+
+	fileName = findIndex(backup_path, fingerprint)
+	if (fileName != None):
+		return sqlite3.connect(fileName), True
+
+	try:
+		if (not os.path.isdir(cacheDir())):
+			os.makedirs(cacheDir())
+		fileName = cacheFileName(fingerprint)
+		if (os.path.exists(fileName)):
+			os.remove(fileName)
+		database = sqlite3.connect(fileName)
+	except (OSError, IOError, sqlite3.Error):
+		# the index must be a file, so that the GUI can read it while it is built
+		print("Unable to write index cache in %s: %s" % (cacheDir(), sys.exc_info()[1]))
+		handle, fileName = tempfile.mkstemp(".sqlite", TEMPORARY_PREFIX)
+		os.close(handle)
+		os.remove(fileName)
+		database = sqlite3.connect(fileName)
+
+	# the cache can always be rebuilt from the manifest: no need for durable writes.
+	# WAL lets other connections read the domains committed while the build goes on
+	database.execute("PRAGMA synchronous = OFF")
+	database.execute("PRAGMA journal_mode = WAL")
+	database.execute("PRAGMA user_version = %i" % SCHEMA_VERSION)
+	database.execute("CREATE TABLE cache_info (fingerprint VARCHAR(40), complete INT)")
+	database.execute("INSERT INTO cache_info (fingerprint, complete) VALUES (?, 0)", (fingerprint,))
+	database.commit()
+
+	return database, False
+
+# True for the index files built in the temp dir, which are not reused and must be removed
+def isTemporary(fileName):
+	name = os.path.basename(fileName)
+	return name.startswith(TEMPORARY_PREFIX) and os.path.dirname(os.path.abspath(fileName)) == os.path.abspath(tempfile.gettempdir())
+
+# flags a freshly built index as usable by later openIndex() calls
+def markComplete(database):
+	database.execute("UPDATE cache_info SET complete = 1")
+	database.commit()
+
+def isComplete(database):
+	try:
+		info = database.execute("SELECT complete FROM cache_info").fetchone()
+	except sqlite3.Error:
+		return False
+	return info != None and info[0] == 1
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# deletes an index file, with its WAL journal (the database must be closed first)
+def removeIndex(fileName):
+	removed = False
+	for name in [fileName, fileName + "-wal", fileName + "-shm"]:
+		if (os.path.exists(name)):
+			os.remove(name)
+			removed = True
+	return removed
+
+# deletes the cached index of the backup dir (the database must be closed first)
+def invalidate(backup_path):
+	return removeIndex(cacheFileName(manifestFingerprint(backup_path)))
+
+# deletes all the cached indexes (files named after a fingerprint: other caches may share the dir),
+# except the index file "keep" (the one of the open backup, which may still be being built)
+def clearAll(keep=None):
+	if (keep != None):
+		keep = os.path.abspath(keep)
+	removed = 0
+	for fileName in glob.glob(os.path.join(cacheDir(), "*.sqlite")):
+		if (len(os.path.splitext(os.path.basename(fileName))[0]) != 40):
+			continue
+		if (os.path.abspath(fileName) == keep):
+			continue
+		try:
+			removeIndex(fileName)
+			removed += 1
+		except OSError:
+			print("Unable to remove cache file %s: %s" % (fileName, sys.exc_info()[1]))
+	return removed
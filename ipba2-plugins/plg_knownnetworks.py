@@ -1,14 +1,14 @@
 from PySide import QtCore, QtGui
 from knownnetworks_ui import Ui_KnownNetworks
 
-import os, sqlite3, plistlib, sys
+import os, sqlite3, plistlib, sys, collections
 from datetime import datetime
 
 PLUGIN_NAME = "Known WiFi Networks"
 import plugins_utils
 
 # retrieve modules from ipba root directory
-import plistutils
+import plistutils, biplist
 
 class KnownNetworksWidget(QtGui.QWidget):
 	
@@ -41,7 +41,7 @@ class KnownNetworksWidget(QtGui.QWidget):
 
 	def populateUI(self):
 	
-		self.networks = plistutils.readPlist(self.filename)['List of known networks']
+		self.networks = plistutils.readPlist(self.filename, lazy=True)['List of known networks']
 		
 		index = 0
 		for network in self.networks:
@@ -98,7 +98,7 @@ class KnownNetworksWidget(QtGui.QWidget):
 
 	def parseNode(self, newNode, parentNode):
 	
-		if (type(newNode) == type({}) or type(newNode) == plistlib._InternalDict):	
+		if (isinstance(newNode, collections.Mapping)):	
 			
 			if (parentNode):
 				dictNode = QtGui.QTreeWidgetItem(parentNode)
@@ -120,7 +120,7 @@ class KnownNetworksWidget(QtGui.QWidget):
 					
 					self.parseNode(newNode[element], titleNode)			
 		
-		elif (type(newNode) == type([])):
+		elif (isinstance(newNode, (list, biplist.LazyArray))):
 			
 			for element in newNode:
 				self.parseNode(element, parentNode)
@@ -8,7 +8,7 @@ PLUGIN_NAME = "Network Identification"
 import plugins_utils
 
 # retrieve modules from ipba root directory
-import plistutils
+import plistutils, biplist
 
 class NetworkIdentWidget(QtGui.QWidget):
 	
@@ -36,7 +36,7 @@ class NetworkIdentWidget(QtGui.QWidget):
 
 	def populateUI(self):
 		
-		signatures = plistutils.readPlist(self.filename)['Signatures']
+		signatures = plistutils.readPlist(self.filename, lazy=True)['Signatures']
 		
 		index = 0
 		for element in signatures:
@@ -65,7 +65,8 @@ class NetworkIdentWidget(QtGui.QWidget):
 		if (currentSelectedElement): pass
 		else: return
 		
-		signatures = plistutils.readPlist(self.filename)['Signatures']
+		# shared through the plist cache: not parsed again on every click
+		signatures = plistutils.readPlist(self.filename, lazy=True)['Signatures']
 		
 		currentNetworkIndex = int(currentSelectedElement.text(0))
 		currentNetworkServices = signatures[currentNetworkIndex]['Services']
@@ -100,7 +101,7 @@ class NetworkIdentWidget(QtGui.QWidget):
 					elementNode = QtGui.QTreeWidgetItem(subserviceNode)
 					elementNode.setText(0, element)
 					text = service[serviceKey][element]
-					if (type(text) == type([1,2])):
+					if (isinstance(text, (list, biplist.LazyArray))):
 						text = ", ".join(text)
 					elementNode.setText(1, text)
 					self.ui.servicesTree.addTopLevelItem(elementNode)
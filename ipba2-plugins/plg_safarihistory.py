@@ -1,7 +1,7 @@
 from PySide import QtCore, QtGui
 from safarihistory_ui import Ui_SafariHistory
 
-import os, sqlite3, plistlib
+import os, sqlite3, plistlib, itertools
 from datetime import datetime
 
 PLUGIN_NAME = "Safari History"
@@ -46,10 +46,27 @@ class SafariHistoryWidget(QtGui.QWidget):
 
 	def populateUI(self):
 	
-		self.historyRecords = plistutils.readPlist(self.filename)['WebHistoryDates']
+		# records are read when shown, and shown in batches: the first ones appear
+		# without going through the whole history (binary plists are decoded lazily,
+		# XML ones parsed incrementally)
+		if (plistutils.isBinaryPlist(self.filename)):
+			self.pendingRecords = iter(plistutils.readPlist(self.filename, lazy=True)['WebHistoryDates'])
+		else:
+			self.pendingRecords = plistutils.iterXmlPlist(self.filename, 'WebHistoryDates')
+		self.historyRecords = []
+		
+		self.populateTimer = QtCore.QTimer(self)
+		QtCore.QObject.connect(self.populateTimer, QtCore.SIGNAL("timeout()"), self.populateBatch)
+		self.populateBatch()
+
+	def populateBatch(self):
+	
+		batch = list(itertools.islice(self.pendingRecords, 500))
+		
+		for record in batch:
 		
-		index = 0
-		for record in self.historyRecords:
+			index = len(self.historyRecords)
+			self.historyRecords.append(record)
 
 			element = QtGui.QTreeWidgetItem(None)
 			element.setText(0, str(index))			
@@ -69,8 +86,11 @@ class SafariHistoryWidget(QtGui.QWidget):
 			element.setText(3, record[''])
 			
 			self.ui.historyTree.addTopLevelItem(element)
-			
-			index += 1			
+		
+		if (len(batch) == 500):
+			self.populateTimer.start(0)
+		else:
+			self.populateTimer.stop()
 
 
 	def ctxMenu(self, pos):
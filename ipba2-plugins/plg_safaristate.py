@@ -48,7 +48,8 @@ class SafariStateWidget(QtGui.QWidget):
 
 	def populateUI(self):
 		
-		documents = plistutils.readPlist(self.filename)['SafariStateDocuments']
+		# memory mapped: the embedded data values are not copied
+		documents = plistutils.readPlist(self.filename, mapped=True)['SafariStateDocuments']
 		
 		index = 0
 		for document in documents:
@@ -127,7 +128,7 @@ class SafariStateWidget(QtGui.QWidget):
 		if (currentSelectedElement): pass
 		else: return
 		
-		documents = plistutils.readPlist(self.filename)['SafariStateDocuments']
+		documents = plistutils.readPlist(self.filename, mapped=True)['SafariStateDocuments']
 		
 		currentTabIndex = int(currentSelectedElement.text(0))
 		currentTab = documents[currentTabIndex]
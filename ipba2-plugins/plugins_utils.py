@@ -13,24 +13,15 @@
 import sqlite3, sys, os
 from PySide import QtCore, QtGui
 
+# retrieve modules from ipba root directory
+import backupindex
+
 # MAIN FUNCTION --------------------------------------------------------------------------------
 
 def realFileName(cursor, filename="", domaintype="", path="", domain=""):
-	query = "SELECT fileid FROM indice WHERE 1=1"
-	if (filename != ""):
-		query = query + " AND file_name = \"%s\""%filename
-	if (domaintype != ""):
-		query = query + " AND domain_type = \"%s\""%domaintype
-	if (domain != ""):
-		query = query + " AND domain = \"%s\""%domain
-	if (path != ""):
-		query = query + "AND file_path = \"%s\""%path
-
-	cursor.execute(query);
-	results = cursor.fetchall()
-			
-	if (len(results) > 0):
-		return results[0][0]
+	element = backupindex.lookup(cursor, domain_type=domaintype, domain=domain, path=path, name=filename)
+	if (element != None):
+		return element['fileid']
 	else:
 		return ""
 
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+
+'''
+ Analyzer for iPhone backup made by Apple iTunes
+
+ (C)opyright 2013 Mario Piccinelli <mario.piccinelli@gmail.com>
+ Released under MIT licence
+
+ keyedarchive.KeyedArchive unarchives NSKeyedArchiver plists: the $objects
+ table is followed from $top, UIDs are resolved, and the instances of the
+ common Foundation classes become python values:
+
+     NSArray, NSSet, NSOrderedSet         ArchivedArray (sequence)
+     NSDictionary                         ArchivedDictionary (mapping)
+     NSString, NSURL                      string
+     NSData                               biplist.Data (or DataView)
+     NSDate                               datetime (UTC)
+     NSUUID                               uuid.UUID
+     NSNull, $null                        None
+
+ Instances of any other class are ArchivedObject. Members of arrays and
+ dictionaries and fields of objects are resolved only when accessed, and the
+ plist is read lazily and memory mapped, so that only the objects reached are
+ decoded; every UID is resolved once, and objects referencing each other
+ (cycles) resolve to the same python object.
+
+     archive = keyedarchive.readArchive("/path/to/file.plist")
+     print archive.root
+
+ To walk the whole archive, readArchive(fileName, eager=True) decodes the plist
+ and resolves every object in a single pass instead.
+
+ Command line usage: python keyedarchive.py <plist> prints the root object.
+
+'''
+
+import sys, gc, datetime, uuid, urlparse
+
+import biplist, plistutils
+
+try:
+	from collections.abc import Mapping, Sequence
+except ImportError:
+	from collections import Mapping, Sequence
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+class KeyedArchiveException(Exception):
+	"""Raised when a plist is not a readable NSKeyedArchiver archive."""
+	pass
+
+# number of a UID: biplist.Uid in binary plists, {"CF$UID": n} in XML ones; None for other values
+def uidNumber(value):
+	if (value.__class__ is biplist.Uid):
+		return int(value)
+	if ((isinstance(value, dict) or value.__class__ is biplist.LazyDict) and len(value) == 1 and "CF$UID" in value):
+		return int(value["CF$UID"])
+	return None
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# instance of a class without decoder (see classDecoders)
+class ArchivedObject(object):
+
+	def __init__(self, archive, className, classes, fields):
+		self.archive = archive
+		self.className = className
+		self.classes = classes
+		self.fields = fields
+
+	def __getitem__(self, key):
+		if (key == "$class"):
+			raise KeyError(key)
+		return self.archive.value(self.fields[key])
+
+	def __contains__(self, key):
+		return key != "$class" and key in self.fields
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def __len__(self):
+		return len(self.keys())
+
+	def get(self, key, default=None):
+		if (key in self):
+			return self[key]
+		return default
+
+	def keys(self):
+		return [key for key in self.fields.keys() if key != "$class"]
+
+	def items(self):
+		return [(key, self[key]) for key in self.keys()]
+
+	def __repr__(self):
+		return "<%s %s>" % (self.className, ", ".join(sorted(self.keys())))
+
+# NSArray, NSSet or NSOrderedSet: members are resolved when accessed
+class ArchivedArray(Sequence):
+
+	def __init__(self, archive, members):
+		self.archive = archive
+		self.members = members
+
+	def __len__(self):
+		return len(self.members)
+
+	def __getitem__(self, index):
+		if (isinstance(index, slice)):
+			return [self.archive.value(member) for member in self.members[index]]
+		return self.archive.value(self.members[index])
+
+	def __iter__(self):
+		value = self.archive.value
+		for member in self.members:
+			yield value(member)
+
+	def __eq__(self, other):
+		if (not isinstance(other, (list, ArchivedArray))):
+			return NotImplemented
+		return len(self) == len(other) and list(self) == list(other)
+
+	def __ne__(self, other):
+		result = self.__eq__(other)
+		if (result is NotImplemented):
+			return result
+		return not result
+
+	__hash__ = None
+
+	def __repr__(self):
+		return "ArchivedArray(%i members)" % len(self.members)
+
+# NSDictionary: keys are resolved with the dictionary, values when accessed
+class ArchivedDictionary(Mapping):
+
+	def __init__(self, archive, keys, values):
+		self.archive = archive
+		self.values = values
+		self.index = dict([(archive.value(keys[i]), i) for i in range(len(keys))])
+
+	def __len__(self):
+		return len(self.index)
+
+	def __getitem__(self, key):
+		return self.archive.value(self.values[self.index[key]])
+
+	def __iter__(self):
+		return iter(self.index)
+
+	def __contains__(self, key):
+		return key in self.index
+
+	def __repr__(self):
+		return "ArchivedDictionary(%r)" % list(self.index.keys())
+
+# decoders of the Foundation classes: decoder(archive, number, fields) returns the value of
+# object "number", which resolve() then remembers. Values resolving UIDs while they are built
+# (dictionary keys) must remember themselves first, so that cycles come back to them.
+
+def decodeArray(archive, number, fields):
+	return ArchivedArray(archive, fields.get("NS.objects", []))
+
+def decodeDictionary(archive, number, fields):
+	result = ArchivedDictionary.__new__(ArchivedDictionary)
+	archive.remember(number, result)
+	result.__init__(archive, fields.get("NS.keys", []), fields.get("NS.objects", []))
+	return result
+
+def decodeString(archive, number, fields):
+	return archive.value(fields.get("NS.string", ""))
+
+def decodeData(archive, number, fields):
+	if ("NS.bytes" in fields):
+		return archive.value(fields["NS.bytes"])
+	return archive.value(fields.get("NS.data", biplist.Data("")))
+
+def decodeDate(archive, number, fields):
+	return datetime.datetime(2001, 1, 1) + datetime.timedelta(seconds=archive.value(fields["NS.time"]))
+
+def decodeUUID(archive, number, fields):
+	return uuid.UUID(bytes=str(archive.value(fields["NS.uuidbytes"])))
+
+def decodeURL(archive, number, fields):
+	base = archive.value(fields.get("NS.base"))
+	relative = archive.value(fields.get("NS.relative", ""))
+	if (base == None):
+		return relative
+	return urlparse.urljoin(base, relative)
+
+def decodeNull(archive, number, fields):
+	return None
+
+classDecoders = {
+	"NSArray": decodeArray,
+	"NSSet": decodeArray,
+	"NSOrderedSet": decodeArray,
+	"NSDictionary": decodeDictionary,
+	"NSString": decodeString,
+	"NSData": decodeData,
+	"NSDate": decodeDate,
+	"NSUUID": decodeUUID,
+	"NSURL": decodeURL,
+	"NSNull": decodeNull,
+}
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+class KeyedArchive(object):
+
+	def __init__(self, plist):
+		"""
+		Archive of the parsed plist (best read lazily, see readArchive).
+		Raises KeyedArchiveException.
+		"""
+		if (not isinstance(plist, Mapping) or plist.get("$archiver") != "NSKeyedArchiver"):
+			raise KeyedArchiveException("Not a NSKeyedArchiver archive")
+		if ("$objects" not in plist or "$top" not in plist):
+			raise KeyedArchiveException("Archive without $objects or $top")
+		self.plist = plist
+		self.objects = plist["$objects"]
+		self.resolved = {}
+		self.classes = {}
+		self.topObjects = None
+
+	# resolved $top: name -> object
+	@property
+	def top(self):
+		if (self.topObjects == None):
+			top = self.plist["$top"]
+			self.topObjects = dict([(key, self.value(top[key])) for key in top.keys()])
+		return self.topObjects
+
+	# the root object (most archives have a single one, "root")
+	@property
+	def root(self):
+		top = self.plist["$top"]
+		if ("root" in top):
+			return self.value(top["root"])
+		return self.value(top[sorted(top.keys())[0]])
+
+	# value of a field: the object a UID points to, the field itself otherwise
+	def value(self, field):
+		if (field.__class__ is biplist.Uid):
+			return self.resolve(field)
+		number = uidNumber(field)
+		if (number == None):
+			return field
+		return self.resolve(number)
+
+	def remember(self, number, value):
+		self.resolved[number] = value
+		return value
+
+	# the object number "number" of $objects
+	def resolve(self, number):
+		resolved = self.resolved
+		if (number in resolved):
+			return resolved[number]
+
+		try:
+			raw = self.objects[number]
+		except IndexError:
+			raise KeyedArchiveException("UID %i out of $objects (%i objects)" % (number, len(self.objects)))
+
+		if (isinstance(raw, basestring) and raw == "$null"):
+			return self.remember(number, None)
+		# (LazyDict is an abstract Mapping: isinstance on it is slow)
+		if (not (isinstance(raw, dict) or raw.__class__ is biplist.LazyDict) or "$class" not in raw):
+			return self.remember(number, raw)
+
+		className, classes, decoder = self.classInfo(uidNumber(raw["$class"]))
+		if (decoder == None):
+			result = ArchivedObject(self, className, classes, raw)
+		else:
+			result = decoder(self, number, raw)
+		resolved[number] = result
+		return result
+
+	# resolves all of $objects in a single pass: faster than reaching them one by one when the
+	# whole archive is going to be traversed (see readArchive)
+	def resolveAll(self):
+		# the collector would rescan the growing memo every few thousand objects
+		gcEnabled = gc.isenabled()
+		gc.disable()
+		try:
+			resolved = self.resolved
+			resolve = self.resolve
+			for number in range(len(self.objects)):
+				if (number not in resolved):
+					resolve(number)
+		finally:
+			if (gcEnabled): gc.enable()
+		return self
+
+	# (class name, class and superclasses names, decoder or None) of the class object "number"
+	def classInfo(self, number):
+		if (number not in self.classes):
+			try:
+				raw = self.objects[number]
+				className = raw["$classname"]
+				classes = list(raw.get("$classes", [className]))
+			except (IndexError, KeyError, TypeError):
+				raise KeyedArchiveException("Invalid $class reference %r" % number)
+			decoders = [classDecoders[name] for name in classes if name in classDecoders]
+			self.classes[number] = (className, classes, decoders and decoders[0] or None)
+		return self.classes[number]
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# archive of the plist file, read through the plist cache. Binary plists are memory mapped, and
+# read lazily unless "eager": eager archives decode the whole plist and resolve all of
+# $objects up front, which is faster for a full traversal
+def readArchive(fileName, eager=False):
+	gcEnabled = gc.isenabled()
+	if (eager): gc.disable()
+	try:
+		plist = plistutils.readPlist(fileName, mapped=True, lazy=not eager)
+	finally:
+		if (gcEnabled): gc.enable()
+	if (plist == None):
+		raise KeyedArchiveException("Unable to read plist %s" % fileName)
+	archive = KeyedArchive(plist)
+	if (eager):
+		archive.resolveAll()
+	return archive
+
+# the root object of the archive file
+def unarchive(fileName):
+	return readArchive(fileName).root
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+
+	if (len(sys.argv) < 2):
+		print("Usage: python keyedarchive.py <plist>")
+		sys.exit(1)
+
+	print(readArchive(sys.argv[1]).root)
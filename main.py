@@ -31,8 +31,8 @@ iPBAVersionDate = "mar 2013"
 
 # --- GENERIC IMPORTS -----------------------------------------------------------------------------
 
-import sys, sqlite3, datetime, os, hashlib, shutil, zipfile, collections, posixpath
-import mbdbdecoding, plistutils, magic, traceback
+import sys, sqlite3, datetime, os, hashlib, shutil, zipfile, collections, posixpath, time, mmap
+import mbdbdecoding, plistutils, magic, traceback, indexcache, backupindex, typecache
 
 # homemade library to build html reports
 import html_util
@@ -89,23 +89,13 @@ class PlistWidget(QtGui.QWidget):
 		
 	def parsePlist(self):
 		
-		# check whether binary or plain
-		f = open(self.fileName, 'rb')
-		head = f.read(8)
-		f.close()
+		# shared with the plugins through the plist cache (None if unreadable)
+		plist = plistutils.readPlist(self.fileName)
+		if (plist == None):
+			return
 		
 		try:
-		
-			# plain
-			if head != "bplist00":
-				plist = plistlib.readPlist(self.fileName)
-		
-			# binary
-			else:
-				plist = biplist.readPlist(self.fileName)		
-			
 			self.parseNode(plist, None)			
-			
 		except:
 			print "Unexpected error:", sys.exc_info()
 
@@ -172,30 +162,92 @@ class TextWidget(QtGui.QWidget):
 
 # ------------------------------------------------------------------------------------------------
 
-class HexWidget(QtGui.QWidget):
+class HexTableModel(QtCore.QAbstractTableModel):
+	"""
+	Model of the hex viewer: the bytes of the file, 16 per row, then their text. The file is
+	memory mapped and only the rows the view asks for (the visible ones) are formatted.
+	"""
+
+	rowLength = 16
+	cachedRows = 256
 
-	page = 0
-	pageSize = 1024
-	
 	FILTER=''.join([(len(repr(chr(x)))==3) and chr(x) or '.' for x in range(256)])
-	def hex2string(self, src, length=8):
-		N=0; result=''
-		while src:
-			s,src = src[:length],src[length:]
-			s = s.translate(self.FILTER)
-			N+=length
-			result += s
-		return result
+	HEX=["%02X"%x for x in range(256)]
+
+	def __init__(self, fileName, parent = None):
+		super(HexTableModel, self).__init__(parent)
+		self.file = open(fileName, 'rb')
+		self.size = os.fstat(self.file.fileno()).st_size
+		if (self.size > 0):
+			self.contents = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+		else:
+			# empty files can not be mapped
+			self.contents = ""
+		# formatted rows, least recently used first
+		self.rows = collections.OrderedDict()
+		self.offsetFormat = "%%0%iX"%max(4, len("%X"%self.size))
+
+	def close(self):
+		self.beginResetModel()
+		if (isinstance(self.contents, mmap.mmap)):
+			self.contents.close()
+		self.file.close()
+		self.contents = ""
+		self.size = 0
+		self.rows.clear()
+		self.endResetModel()
+
+	# cells of a row: the hex bytes (None past the end of the file), then the text
+	def formattedRow(self, row):
+		cells = self.rows.pop(row, None)
+		if (cells == None):
+			offset = row * self.rowLength
+			chunk = self.contents[offset:offset + self.rowLength]
+			cells = [self.HEX[ord(x)] for x in chunk]
+			cells.extend([None] * (self.rowLength - len(chunk)))
+			cells.append(chunk.translate(self.FILTER))
+		self.rows[row] = cells
+		if (len(self.rows) > self.cachedRows):
+			self.rows.popitem(False)
+		return cells
+
+	def offsetIndex(self, offset):
+		return self.index(offset // self.rowLength, offset % self.rowLength)
+
+	# QAbstractTableModel interface --------------------------------------------------------------
+
+	def rowCount(self, parent = QtCore.QModelIndex()):
+		if (parent.isValid()):
+			return 0
+		# the view counts rows in an int
+		return min((self.size + self.rowLength - 1) // self.rowLength, 0x7fffffff)
+
+	def columnCount(self, parent = QtCore.QModelIndex()):
+		if (parent.isValid()):
+			return 0
+		return self.rowLength + 1
+
+	def data(self, index, role = QtCore.Qt.DisplayRole):
+		if (not index.isValid()):
+			return None
+		if (role == QtCore.Qt.DisplayRole):
+			return self.formattedRow(index.row())[index.column()]
+		if (role == QtCore.Qt.ToolTipRole and index.column() < self.rowLength):
+			offset = index.row() * self.rowLength + index.column()
+			if (offset < self.size):
+				return "Offset %X (%i)"%(offset, offset)
+		return None
+
+	def headerData(self, section, orientation, role = QtCore.Qt.DisplayRole):
+		if (role != QtCore.Qt.DisplayRole):
+			return None
+		if (orientation == QtCore.Qt.Vertical):
+			return self.offsetFormat%(section * self.rowLength)
+		if (section < self.rowLength):
+			return "%X"%section
+		return "Text"
 
-	def hex2numsArray(self, src, length=1):
-		N=0; result=[]
-		while src:
-		   s,src = src[:length],src[length:]
-		   hexa = ' '.join(["%02X"%ord(x) for x in s])
-		   s = s.translate(self.FILTER)
-		   N+=length
-		   result.append(hexa)
-		return result
+class HexWidget(QtGui.QWidget):
 
 	def setTitle(self, title):
 		self.setWindowTitle(title)
@@ -209,68 +261,49 @@ class HexWidget(QtGui.QWidget):
 		self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
 		
 		self.fileName = fileName
+		self.model = None
 
-		QtCore.QObject.connect(self.ui.buttonRight, QtCore.SIGNAL("clicked()"), self.rightButtonClicked)
-		QtCore.QObject.connect(self.ui.buttonLeft, QtCore.SIGNAL("clicked()"), self.leftButtonClicked)
-		QtCore.QObject.connect(self.ui.buttonTop, QtCore.SIGNAL("clicked()"), self.topButtonClicked)
+		QtCore.QObject.connect(self.ui.buttonGo, QtCore.SIGNAL("clicked()"), self.goToOffset)
+		QtCore.QObject.connect(self.ui.offsetEdit, QtCore.SIGNAL("returnPressed()"), self.goToOffset)
 		
-		self.updateTable()
+		try:
+			self.model = HexTableModel(self.fileName, self)
+		except (IOError, OSError, mmap.error):
+			print "Unexpected error:", sys.exc_info()
+			return
+
+		self.ui.hexTable.setModel(self.model)
+		self.ui.sizeLabel.setText("%i bytes"%self.model.size)
+
+		# all rows have the same height: the header must not measure them (millions on big files)
+		verticalHeader = self.ui.hexTable.verticalHeader()
+		verticalHeader.setResizeMode(QtGui.QHeaderView.Fixed)
+		verticalHeader.setDefaultSectionSize(self.ui.hexTable.fontMetrics().height() + 4)
 		
+		# measures the visible rows only
+		self.ui.hexTable.resizeColumnsToContents()
 		
-	def updateTable(self):	
-	
-		self.ui.hexTable.clear()
-
-		for i in range(0,16):
-			newItem = QtGui.QTableWidgetItem("%X"%i)
-			self.ui.hexTable.setHorizontalHeaderItem(i, newItem)
+	def goToOffset(self):
+		if (self.model == None): return
 		
+		text = str(self.ui.offsetEdit.text()).strip()
 		try:
-			fh = open(self.fileName, 'rb')
-			fh.seek(self.pageSize*self.page)
-			text = fh.read(self.pageSize)
-			
-			self.ui.hexTable.setRowCount(int(len(text) / 16))
-		
-			row = 0
-			while text:
-				s, text = text[:16],text[16:]
-				
-				col = 0
-				for element in self.hex2numsArray(s):
-					
-					newItem = QtGui.QTableWidgetItem(str(element))
-					self.ui.hexTable.setItem(row, col, newItem)				
-					col = col + 1
-				
-				newItem = QtGui.QTableWidgetItem(str(self.hex2string(s)))
-				self.ui.hexTable.setItem(row, 16, newItem)
-				
-				newItem = QtGui.QTableWidgetItem("%04X"%(row * 16 + self.page * self.pageSize))
-				self.ui.hexTable.setVerticalHeaderItem(row, newItem)
-				
-				row = row + 1
-			
-			fh.close()
+			offset = int(text, 16)
+		except ValueError:
+			QtGui.QMessageBox.warning(self, "Hex Viewer", "Invalid offset: %s"%text)
+			return
+		if (offset < 0 or offset >= self.model.size):
+			QtGui.QMessageBox.warning(self, "Hex Viewer", "Offset %X is out of the file (%X bytes)."%(offset, self.model.size))
+			return
 		
-		except:
-			print "Unexpected error:", sys.exc_info()
-
-		self.ui.hexTable.resizeColumnsToContents()		
-		self.ui.hexTable.resizeRowsToContents()		
+		index = self.model.offsetIndex(offset)
+		self.ui.hexTable.scrollTo(index, QtGui.QAbstractItemView.PositionAtTop)
+		self.ui.hexTable.setCurrentIndex(index)
 		
-	def leftButtonClicked(self):
-		if (self.page > 0):
-			self.page = self.page - 1
-			self.updateTable()
-
-	def rightButtonClicked(self):
-		self.page = self.page + 1
-		self.updateTable()	
-	
-	def topButtonClicked(self):
-		self.page = 0
-		self.updateTable()	
+	def closeEvent(self, event):
+		if (self.model != None):
+			self.model.close()
+		super(HexWidget, self).closeEvent(event)
 
 # ------------------------------------------------------------------------------------------------
 
@@ -492,7 +525,10 @@ class SqliteWidget(QtGui.QWidget):
 					
 						#maybe an image?
 						if (fieldsNames[columnIndex] == "data"):
-							dataMagic = magic.whatis(value)
+							if (type(field) == buffer):
+								dataMagic = magic.whatis_buffer(field)
+							else:
+								dataMagic = magic.whatis(value)
 
 							if (dataMagic.partition("/")[0] == "image"):			
 							
@@ -537,6 +573,304 @@ class SqliteWidget(QtGui.QWidget):
 
 # ------------------------------------------------------------------------------------------------
 		
+class FileTreeNode(object):
+	"""
+	A node of the file tree. Nodes holding domain contents (domains, directories) have
+	domain_type/domain/path set, and their children are read from the index only when
+	first needed (see FileTreeModel.fetchMore).
+	"""
+
+	__slots__ = ['parent', 'row', 'children', 'fetched', 'name', 'type', 'size', 'id', 'domain_type', 'domain', 'path', 'isDomain']
+
+	def __init__(self, parent, name, type = "", size = "", id = ""):
+		self.parent = parent
+		self.row = 0
+		self.children = []
+		self.fetched = True
+		self.name = name
+		self.type = type
+		self.size = size
+		self.id = id
+		self.domain_type = None
+		self.domain = None
+		self.path = None
+		self.isDomain = False
+
+	# columns of the tree: name, type, size, id
+	def text(self, column):
+		return (self.name, self.type, self.size, self.id)[column]
+
+	def setContents(self, domain_type, domain, path):
+		self.domain_type = domain_type
+		self.domain = domain
+		self.path = path
+		self.fetched = False
+
+class FileTreeModel(QtCore.QAbstractItemModel):
+	"""
+	Model of the main file tree: "Standard files", then the domain families with their
+	domains, whose directories and files are read from the backup index on expansion.
+	"""
+
+	headers = ["Name", "Type", "Size", "ID"]
+
+	def __init__(self, backupIndex, parent = None):
+		super(FileTreeModel, self).__init__(parent)
+		self.backupIndex = backupIndex
+		self.root = FileTreeNode(None, "")
+		self.domainTypeNodes = {}
+		self.domainNodes = {}
+
+	def clear(self):
+		self.beginResetModel()
+		self.root = FileTreeNode(None, "")
+		self.domainTypeNodes = {}
+		self.domainNodes = {}
+		self.endResetModel()
+
+	def nodeFromIndex(self, index):
+		if (index.isValid()):
+			return index.internalPointer()
+		return self.root
+
+	def indexFromNode(self, node):
+		if (node == self.root):
+			return QtCore.QModelIndex()
+		return self.createIndex(node.row, 0, node)
+
+	# QAbstractItemModel interface ---------------------------------------------------------------
+
+	def index(self, row, column, parent = QtCore.QModelIndex()):
+		parentNode = self.nodeFromIndex(parent)
+		if (row < 0 or row >= len(parentNode.children) or column < 0 or column >= len(self.headers)):
+			return QtCore.QModelIndex()
+		return self.createIndex(row, column, parentNode.children[row])
+
+	def parent(self, index):
+		if (not index.isValid()):
+			return QtCore.QModelIndex()
+		return self.indexFromNode(index.internalPointer().parent)
+
+	def rowCount(self, parent = QtCore.QModelIndex()):
+		if (parent.column() > 0):
+			return 0
+		return len(self.nodeFromIndex(parent).children)
+
+	def columnCount(self, parent = QtCore.QModelIndex()):
+		return len(self.headers)
+
+	def hasChildren(self, parent = QtCore.QModelIndex()):
+		node = self.nodeFromIndex(parent)
+		return len(node.children) > 0 or not node.fetched
+
+	def data(self, index, role = QtCore.Qt.DisplayRole):
+		if (not index.isValid()):
+			return None
+		node = index.internalPointer()
+		if (role == QtCore.Qt.DisplayRole):
+			return node.text(index.column())
+		if (role == QtCore.Qt.ToolTipRole and index.column() == 0 and node.path != None):
+			# files show their type, once classified
+			if (node.type != 'd' and node.id != ""):
+				element = self.backupIndex.element(node.id)
+				if (element != None and element['magic']):
+					return "%s (%s)"%(node.name, element['magic'])
+			return node.name
+		return None
+
+	def headerData(self, section, orientation, role = QtCore.Qt.DisplayRole):
+		if (orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole):
+			return self.headers[section]
+		return None
+
+	def canFetchMore(self, parent):
+		return not self.nodeFromIndex(parent).fetched
+
+	def fetchMore(self, parent):
+		node = self.nodeFromIndex(parent)
+		if (node.fetched or self.backupIndex.database == None):
+			return
+		node.fetched = True
+
+		newNodes = []
+		for row in self.backupIndex.iter_children(node.domain_type, node.domain, node.path):
+			if (row['type'] == 'd'):
+				child = FileTreeNode(node, row['name'], 'd', "", row['id'] != None and str(row['id']) or "")
+				child.setContents(node.domain_type, node.domain, row['path'])
+			else:
+				if (row['filelen'] < 1024):
+					file_dim = str(row['filelen']) + " b"
+				else:
+					file_dim = str(row['filelen'] / 1024) + " kb"
+				child = FileTreeNode(node, row['name'], str(row['type']), file_dim, str(row['id']))
+				child.path = row['path']
+			newNodes.append(child)
+
+		if (len(newNodes) > 0):
+			first = len(node.children)
+			self.beginInsertRows(parent, first, first + len(newNodes) - 1)
+			for position, child in enumerate(newNodes):
+				child.row = first + position
+			node.children.extend(newNodes)
+			self.endInsertRows()
+
+	# tree building ------------------------------------------------------------------------------
+
+	def insertNode(self, parentNode, position, node):
+		self.beginInsertRows(self.indexFromNode(parentNode), position, position)
+		parentNode.children.insert(position, node)
+		for row in range(position, len(parentNode.children)):
+			parentNode.children[row].row = row
+		self.endInsertRows()
+
+	def addStandardFiles(self, names):
+		standardFiles = FileTreeNode(self.root, "Standard files")
+		for name in names:
+			standardFiles.children.append(FileTreeNode(standardFiles, name, "X"))
+			standardFiles.children[-1].row = len(standardFiles.children) - 1
+		self.insertNode(self.root, 0, standardFiles)
+
+	# returns the node of a domain family, creating it (in sorted position) if needed
+	def domainTypeNode(self, domain_type):
+		node = self.domainTypeNodes.get(domain_type, None)
+		if (node == None):
+			node = FileTreeNode(self.root, domain_type)
+			node.isDomain = True
+			position = 0
+			while (position < len(self.root.children) and (not self.root.children[position].isDomain or self.root.children[position].name < domain_type)):
+				position += 1
+			self.insertNode(self.root, position, node)
+			self.domainTypeNodes[domain_type] = node
+		return node
+
+	def addDomain(self, domain_type, domain):
+		"""
+		Shows a domain whose elements are in the index: unnamed domains (HomeDomain, ...)
+		are browsed from the family node, named ones get a node of their own. If the
+		domain is already shown, the contents read so far are read again.
+		"""
+		node = self.domainNodes.get((domain_type, domain), None)
+		if (node == None):
+			familyNode = self.domainTypeNode(domain_type)
+			if (domain == ""):
+				node = familyNode
+			else:
+				node = FileTreeNode(familyNode, domain)
+				node.isDomain = True
+				# domains are sorted by name, before the elements of the family
+				position = 0
+				while (position < len(familyNode.children) and familyNode.children[position].isDomain and familyNode.children[position].name < domain):
+					position += 1
+				self.insertNode(familyNode, position, node)
+			node.setContents(domain_type, domain, "")
+			self.domainNodes[(domain_type, domain)] = node
+			self.setDomainRoot(node)
+			return
+
+		if (not node.fetched):
+			return
+
+		# drop the contents read so far (domain nodes come first) and read them again
+		first = len([child for child in node.children if child.isDomain])
+		if (first < len(node.children)):
+			self.beginRemoveRows(self.indexFromNode(node), first, len(node.children) - 1)
+			del node.children[first:]
+			self.endRemoveRows()
+		node.fetched = False
+		self.fetchMore(self.indexFromNode(node))
+
+	# the root directory of a domain (empty path) is shown by the domain node itself
+	def setDomainRoot(self, node):
+		row = self.backupIndex.domain_root(node.domain_type, node.domain)
+		if (row == None):
+			return
+		node.type = 'd'
+		node.id = str(row['id'])
+		index = self.indexFromNode(node)
+		self.dataChanged.emit(index, self.createIndex(node.row, len(self.headers) - 1, node))
+
+# ------------------------------------------------------------------------------------------------
+
+class IngestThread(QtCore.QThread):
+	"""
+	Opens (building it if needed) the index of a backup away from the GUI thread.
+	Completed domains are reported in batches through domainsReady(fileName, domains),
+	so that the GUI can read them from the index file while the build goes on, then
+	indexReady() is emitted and the types of the files are classified (see
+	BackupIndex.classify).
+	"""
+
+	progress = QtCore.Signal(object, object)
+	domainsReady = QtCore.Signal(object, object)
+	indexReady = QtCore.Signal()
+
+	# minimum interval (seconds) between two domainsReady signals
+	emitInterval = 0.25
+
+	def __init__(self, backup_path, fingerprint = None, parent = None):
+		super(IngestThread, self).__init__(parent)
+		self.backup_path = backup_path
+		# manifest fingerprint, if already computed (see indexcache.manifestFingerprint)
+		self.fingerprint = fingerprint
+		self.index = backupindex.BackupIndex()
+		self.fileName = None
+		self.cached = False
+		self.cancelRequested = False
+		self.cancelled = False
+		self.error = None
+		self.pendingDomains = []
+		self.lastEmit = 0
+
+	def cancel(self):
+		self.cancelRequested = True
+
+	def run(self):
+		try:
+			self.cached = self.index.open(self.backup_path, self.progress.emit, self.domainDone, lambda: self.cancelRequested, self.fingerprint)
+			self.fileName = self.index.fileName
+			# a cached index is complete: all its domains are ready at once
+			if (self.cached):
+				for domain_type in self.index.domain_types():
+					for domain in self.index.domains(domain_type):
+						self.pendingDomains.append((domain_type, domain))
+			self.flushDomains()
+		except backupindex.IngestCancelled:
+			self.cancelled = True
+		except:
+			self.error = sys.exc_info()
+		
+		if (self.error == None and not self.cancelled):
+			self.indexReady.emit()
+			# types already known from other backups are not read again (a sqlite
+			# connection is bound to its thread: this one has its own)
+			typeCache = typecache.TypeCache(4096, typecache.defaultFileName())
+			try:
+				classified = self.index.classify(cancelled = lambda: self.cancelRequested, cache = typeCache)
+				if (classified > 0):
+					print("Classified %i files"%classified)
+			except backupindex.IngestCancelled:
+				pass
+			except:
+				print("Unable to classify the backup files: %s"%sys.exc_info()[1])
+			typeCache.close()
+		# the GUI still reads the index: it removes a temporary one when closing the backup
+		self.index.close(False)
+
+	def domainDone(self, domain_type, domain):
+		self.fileName = self.index.fileName
+		if ((domain_type, domain) not in self.pendingDomains):
+			self.pendingDomains.append((domain_type, domain))
+		if (time.time() - self.lastEmit > self.emitInterval):
+			self.flushDomains()
+
+	def flushDomains(self):
+		if (len(self.pendingDomains) > 0):
+			self.domainsReady.emit(self.fileName, self.pendingDomains)
+			self.pendingDomains = []
+		self.lastEmit = time.time()
+
+# ------------------------------------------------------------------------------------------------
+
 class IPBA2(QtGui.QMainWindow):
 
 	def __init__(self):
@@ -550,12 +884,25 @@ class IPBA2(QtGui.QMainWindow):
 		# set to NONE if no backup is loaded
 		# and check its noneness to lock analysis functions
 		self.backup_path = None
+		self.manifestFingerprint = None
+		self.index = backupindex.BackupIndex()
+		self.cursor = None
+		self.indexComplete = False
+		self.ingestThread = None
+		self.ingestProgress = None
+		
+		# file types (magic) already read, also kept on disk next to the index cache
+		self.typeCache = typecache.TypeCache(4096, typecache.defaultFileName())
 	
 		#self.openBackup()
 		
 		self.loadPlugins()
+		self.enableAnalysis(False)
 		
-		QtCore.QObject.connect(self.ui.fileTree, QtCore.SIGNAL("itemSelectionChanged()"), self.onTreeClick)
+		# the file tree reads directories from the index as they are expanded
+		self.fileTreeModel = FileTreeModel(self.index, self)
+		self.ui.fileTree.setModel(self.fileTreeModel)
+		self.ui.fileTree.selectionModel().selectionChanged.connect(lambda selected, deselected: self.onTreeClick())
 		
 		self.ui.fileTree.setColumnWidth(0,200)
 		self.ui.fileTree.setColumnWidth(2,16)
@@ -569,6 +916,15 @@ class IPBA2(QtGui.QMainWindow):
 		QtCore.QObject.connect(self.ui.menu_openarchive, QtCore.SIGNAL("triggered(bool)"), self.openBackupGUI)
 		QtCore.QObject.connect(self.ui.menu_closearchive, QtCore.SIGNAL("triggered(bool)"), self.closeBackup)
 		QtCore.QObject.connect(self.ui.menu_quit, QtCore.SIGNAL("triggered(bool)"), self.quitApp)
+		
+		# index cache actions (the backup index is kept on disk between sessions, see indexcache.py)
+		self.rebuildIndexAction = QtGui.QAction("Rebuild backup index", self)
+		self.rebuildIndexAction.triggered.connect(self.rebuildIndex)
+		self.ui.menuFile.insertAction(self.ui.separatorMRUList, self.rebuildIndexAction)
+		self.clearIndexCacheAction = QtGui.QAction("Clear index cache", self)
+		self.clearIndexCacheAction.triggered.connect(self.clearIndexCache)
+		self.ui.menuFile.insertAction(self.ui.separatorMRUList, self.clearIndexCacheAction)
+		
 		self.ui.separatorMRUList.setSeparator(True)
 		self.mru_list = list()
 		self.mruLoadList()
@@ -744,7 +1100,7 @@ class IPBA2(QtGui.QMainWindow):
 				
 	def runPlugin(self, modname):
 		
-			if (self.backup_path == None):
+			if (self.backup_path == None or not self.indexComplete):
 				return
 				
 			# check if plugin already open
@@ -772,7 +1128,7 @@ class IPBA2(QtGui.QMainWindow):
 
 	def runReport(self, modname): # mario piccinelli, fabio sangiacomo
 	
-			if (self.backup_path == None):
+			if (self.backup_path == None or not self.indexComplete):
 				return
 	
 			# getting report method from selected plugin
@@ -870,15 +1226,10 @@ class IPBA2(QtGui.QMainWindow):
 		self.openBackup(newBackupPath)
 
 	def openBackup(self, newBackupPath):
+		# clear main UI and release the previous backup
+		self.closeBackup()
 		self.backup_path = newBackupPath
 		
-		# clear main UI
-		self.ui.backupInfoText.clear()
-		self.ui.fileInfoText.clear()
-		self.ui.imagePreviewLabel.clear()
-		self.ui.fileTree.clear()
-		self.ui.mdiArea.closeAllSubWindows()
-		
 		# attempt to repair db files (windows only, user can cancel)
 		answer = self.repairDBFiles()
 		if (answer == False):
@@ -891,13 +1242,63 @@ class IPBA2(QtGui.QMainWindow):
 
 	def closeBackup(self):
 		self.backup_path = None
+		self.manifestFingerprint = None
 		
 		# clear main UI
 		self.ui.backupInfoText.clear()
 		self.ui.fileInfoText.clear()
 		self.ui.imagePreviewLabel.clear()
-		self.ui.fileTree.clear()
+		self.fileTreeModel.clear()
 		self.ui.mdiArea.closeAllSubWindows()
+		
+		# parsed plists belong to the closed backup
+		plistutils.plistCache.clear()
+		
+		# stop the ingest thread (the partial index is deleted)
+		if (self.ingestThread != None):
+			thread = self.ingestThread
+			self.ingestThread = None
+			thread.cancel()
+			thread.wait()
+			thread.deleteLater()
+		self.closeIngestProgress()
+		
+		# once the thread is done with it (a temporary index is deleted here)
+		self.index.close()
+		self.cursor = None
+		self.indexComplete = False
+		self.enableAnalysis(False)
+
+	# plugins and reports query the index: they are available only once it is complete
+	def enableAnalysis(self, enabled):
+		self.ui.menuPlugins.menuAction().setEnabled(enabled)
+		self.ui.menuReports.menuAction().setEnabled(enabled)
+
+	def rebuildIndex(self):
+		"""
+		Drop the cached index of the open backup and parse its manifest again.
+		"""
+		if (self.backup_path == None):
+			return
+		
+		backup_path = self.backup_path
+		self.closeBackup()
+		indexcache.invalidate(backup_path)
+		self.openBackup(backup_path)
+
+	def clearIndexCache(self):
+		"""
+		Delete the cached indexes of all backups but the open one and the cached file types.
+		"""
+		# the index of the open backup is in use (and may still be being written by the ingest thread)
+		keep = None
+		if (self.backup_path != None):
+			if (self.manifestFingerprint == None):
+				self.manifestFingerprint = indexcache.manifestFingerprint(self.backup_path)
+			keep = indexcache.cacheFileName(self.manifestFingerprint)
+		removed = indexcache.clearAll(keep)
+		self.typeCache.clear()
+		QtGui.QMessageBox.about(self, "Index cache", "Removed %i cached backup indexes and the cached file types from %s."%(removed, indexcache.cacheDir()))
 
 	def quitApp(self):
 		QtGui.QApplication.quit()
@@ -928,10 +1329,11 @@ class IPBA2(QtGui.QMainWindow):
 	def ctxMenu(self, pos):
 
 		# managing "standard" files
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return
 
+		data = None
 		if (currentSelectedElement.text(1) == "X"):	
 			realFileName = os.path.join(self.backup_path, currentSelectedElement.text(0))
 		
@@ -940,7 +1342,7 @@ class IPBA2(QtGui.QMainWindow):
 			if (data == None): return
 			realFileName = os.path.join(self.backup_path, data['fileid'])
 		
-		filemagic = self.readMagic(realFileName)
+		filemagic = self.readMagic(realFileName, data)
 		
 		showMenu = False
 		
@@ -1013,7 +1415,7 @@ class IPBA2(QtGui.QMainWindow):
 	def openSelectedPlist(self):
 		
 		# managing "standard" files
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return
 
@@ -1056,7 +1458,7 @@ class IPBA2(QtGui.QMainWindow):
 	def openSelectedHex(self):
 	
 		# managing "standard" files
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return
 
@@ -1082,7 +1484,7 @@ class IPBA2(QtGui.QMainWindow):
 	def openSelectedText(self):
 	
 		# managing "standard" files
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return
 
@@ -1110,7 +1512,7 @@ class IPBA2(QtGui.QMainWindow):
 	def exportSelectedFile(self):
 	
 		# managing "standard" files
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return
 
@@ -1156,32 +1558,49 @@ class IPBA2(QtGui.QMainWindow):
 
 				# list sqlite files to be repaired
 				sqliteFiles = []
-				backupFiles = os.listdir(self.backup_path)
 
-				# starts progress window
-				progress = QtGui.QProgressDialog("Searching for databases to repair...", "Abort", 0, len(backupFiles), self)
-				progress.setWindowModality(QtCore.Qt.WindowModal)
-				progress.setMinimumDuration(0)
-				progress.show()
-				QtGui.QApplication.processEvents()            	
+				# a cached index whose files have been classified already knows the databases
+				classifiedIndex = False
+				# the fingerprint is kept for the ingest thread, which needs it too
+				self.manifestFingerprint = indexcache.manifestFingerprint(self.backup_path)
+				cachedIndex = indexcache.findIndex(self.backup_path, self.manifestFingerprint)
+				if (cachedIndex != None):
+					index = backupindex.BackupIndex()
+					index.attach(self.backup_path, cachedIndex)
+					if (index.classified()):
+						classifiedIndex = True
+						for element in index.iter_type("data/sqlite"):
+							sqliteFiles.append([str(element['fileid']), os.path.join(self.backup_path, element['fileid'])])
+					index.close()
+
+				if (not classifiedIndex):
+					backupFiles = os.listdir(self.backup_path)
+
+					# starts progress window
+					progress = QtGui.QProgressDialog("Searching for databases to repair...", "Abort", 0, len(backupFiles), self)
+					progress.setWindowModality(QtCore.Qt.WindowModal)
+					progress.setMinimumDuration(0)
+					progress.show()
+					QtGui.QApplication.processEvents()            	
 				
-				readCount = 0
-				for backupFile in backupFiles:
-					item_realpath = os.path.join(self.backup_path,backupFile)
-					if (os.path.exists(item_realpath) == 0):
-						continue	
-					filemagic = magic.file(item_realpath)
-					if (filemagic.partition("/")[2] == "sqlite"):
-						sqliteFiles.append([backupFile, item_realpath])
-					readCount += 1
-					
-					QtGui.QApplication.processEvents() 
-					if (progress.wasCanceled()):
-						return False
+					# files are read concurrently, the GUI is updated every 64 files
+					readCount = 0
+					paths = [os.path.join(self.backup_path, backupFile) for backupFile in backupFiles]
+					for item_realpath, filemagic in magic.classify_many(paths, cache = self.typeCache):
+						if (filemagic != None and filemagic.partition("/")[2] == "sqlite"):
+							sqliteFiles.append([os.path.basename(item_realpath), item_realpath])
+						readCount += 1
 						
-					progress.setValue(readCount)
-				
-				progress.setValue(progress.maximum())
+						if (readCount % 64 == 0):
+							QtGui.QApplication.processEvents() 
+							if (progress.wasCanceled()):
+								return False
+							progress.setValue(readCount)
+					
+					# files complete in any order
+					sqliteFiles.sort()
+					
+					progress.setValue(progress.maximum())
 
 				#------------------- converting sqlite files found in the previous step ----------------------------------
 
@@ -1238,9 +1657,16 @@ class IPBA2(QtGui.QMainWindow):
 				return True
 
 	
+	# return the file tree node of the currently selected element
+	def currentTreeItem(self):
+		currentIndex = self.ui.fileTree.currentIndex()
+		if (not currentIndex.isValid()):
+			return None
+		return self.fileTreeModel.nodeFromIndex(currentIndex)
+
 	# return database ID of the currently selected element
 	def getSelectedElementID(self):
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return None
 		
@@ -1250,7 +1676,7 @@ class IPBA2(QtGui.QMainWindow):
 	# return DB record for selected item
 	def getSelectedElementData(self):
 	
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return None,None
 		
@@ -1272,29 +1698,22 @@ class IPBA2(QtGui.QMainWindow):
 		return data
 	
 	
-	def hex2nums(self, src):
-		return ' '.join(["%02X"%ord(x) for x in src])
-
 	def getElementFromID(self, id):
-		query = "SELECT * FROM indice WHERE id = ?"
-		self.cursor.execute(query, (id,))
-		data = self.cursor.fetchone()
-		
-		if (data == None): return None
-		
-		if (len(data) == 0): 
-			return None
-		else:
-			return data
+		return self.index.element(id)
+
+	# element is the index record of the file, if known: its "magic" column holds the
+	# type once the backup files have been classified
+	def readMagic(self, item_realpath, element = None):
 
-	def readMagic(self, item_realpath):
+		if (element != None and element['magic']):
+			return str(element['magic'])
 
 		# check for existence 
 		if (os.path.exists(item_realpath) == 0):
 			return None
 		
-		# print file type (from magic numbers)
-		filemagic = magic.file(item_realpath)
+		# print file type (from magic numbers, cached)
+		filemagic = self.typeCache.get(item_realpath)
 		return filemagic
 
 
@@ -1304,7 +1723,7 @@ class IPBA2(QtGui.QMainWindow):
 		if (element == None): return
 		
 		realFileName = os.path.join(self.backup_path, element['fileid'])
-		filemagic = self.readMagic(realFileName)
+		filemagic = self.readMagic(realFileName, element)
 		
 		# if sqlite file
 		if (filemagic.partition("/")[2] == "sqlite"):
@@ -1324,7 +1743,7 @@ class IPBA2(QtGui.QMainWindow):
 	def onTreeClick(self):
 	
 		# managing "standard" files
-		currentSelectedElement = self.ui.fileTree.currentItem()
+		currentSelectedElement = self.currentTreeItem()
 		if (currentSelectedElement): pass
 		else: return
 
@@ -1383,13 +1802,11 @@ class IPBA2(QtGui.QMainWindow):
 		self.ui.fileInfoText.append("<strong>Flag</strong>: " + item_flag)
 
 		# file properties (from properties table, which is data from mbdb file)
-		query = "SELECT property_name, property_val FROM properties WHERE file_id = ?"
-		self.cursor.execute(query, (item_id,))
-		data = self.cursor.fetchall()
-		if (len(data) > 0):
+		props = self.index.properties(item_id)
+		if (len(props) > 0):
 			self.ui.fileInfoText.append("")
 			self.ui.fileInfoText.append("<strong>Element properties (from mdbd file)</strong>:")
-			for element in data:
+			for element in props:
 				self.ui.fileInfoText.append("%s: %s" %(element[0], element[1]))
 
 		# treat sym links
@@ -1413,7 +1830,7 @@ class IPBA2(QtGui.QMainWindow):
 		
 		# check file magic
 		realFileName = os.path.join(self.backup_path, item_filecode)
-		filemagic = self.readMagic(realFileName)
+		filemagic = self.readMagic(realFileName, data)
 		self.ui.fileInfoText.append("")
 		self.ui.fileInfoText.append("<strong>File type (from header data)</strong>: " + filemagic)
 
@@ -1432,253 +1849,11 @@ class IPBA2(QtGui.QMainWindow):
 		
 		self.backup_path = os.path.abspath(self.backup_path)
 
-		# if exists Manifest.mbdx, then iOS <= 4
-		iOSVersion = 5
-		mbdxPath = os.path.join(self.backup_path, "Manifest.mbdx")
 		mbdbPath = os.path.join(self.backup_path, "Manifest.mbdb")
-		if (os.path.exists(mbdxPath)):
-			iOSVersion = 4
-			mbdx = mbdbdecoding.process_mbdx_file(mbdxPath)
-		elif (os.path.exists(mbdbPath)):
-			mbdb = mbdbdecoding.process_mbdb_file(mbdbPath)
-		else:
+		if (not os.path.exists(mbdbPath)):
 			print("\nManifest.mbdb/Manifest.mbdx not found in path \"%s\". Are you sure this is a correct iOS backup dir?\n"%(self.backup_path))
 			sys.exit(1)
 
-		# prepares DB
-		database = sqlite3.connect(':memory:') # Create a database file in memory
-		database.row_factory = sqlite3.Row
-		self.cursor = database.cursor() # Create a cursor
-		
-		self.cursor.execute(
-			"CREATE TABLE indice (" + 
-			"id INTEGER PRIMARY KEY AUTOINCREMENT," +
-			"type VARCHAR(1)," +
-			"permissions VARCHAR(9)," +
-			"userid VARCHAR(8)," +
-			"groupid VARCHAR(8)," +
-			"filelen INT," +
-			"mtime INT," +
-			"atime INT," +
-			"ctime INT," +
-			"fileid VARCHAR(50)," +
-			"domain_type VARCHAR(100)," +
-			"domain VARCHAR(100)," +
-			"file_path VARCHAR(100)," +
-			"file_name VARCHAR(100)," + 
-			"link_target VARCHAR(100)," + 
-			"datahash VARCHAR(100)," + 
-			"flag VARCHAR(100)"
-			");"
-		)
-		
-		self.cursor.execute(
-			"CREATE TABLE properties (" + 
-			"id INTEGER PRIMARY KEY AUTOINCREMENT," +
-			"file_id INTEGER," +
-			"property_name VARCHAR(100)," +
-			"property_val VARCHAR(100)" +
-			");"
-		)
-		
-		# starts progress window
-		progress = QtGui.QProgressDialog("Reading backup...", "Abort", 0, 2*len(mbdb.items())/10, self)
-		progress.setWindowModality(QtCore.Qt.WindowModal)
-		progress.setMinimumDuration(0)
-		progress.setCancelButton(None)
-		progress.show()
-		QtGui.QApplication.processEvents()
-		
-		# count items parsed from Manifest file
-		items = 0;
-		
-		# populates database by parsing manifest file
-		for offset, fileinfo in mbdb.items():
-			
-			# iOS 4 (get file ID from mbdx file)
-			if (iOSVersion == 4):
-			
-				if offset in mbdx:
-					fileinfo['fileID'] = mbdx[offset]
-				else:
-					fileinfo['fileID'] = "<nofileID>"
-					print >> sys.stderr, "No fileID found for %s" % fileinfo['filename']
-			
-			# iOS 5 (no MBDX file, use SHA1 of complete file name)
-			elif (iOSVersion == 5):
-				fileID = hashlib.sha1()
-				fileID.update("%s-%s"%(fileinfo['domain'], fileinfo['filename']) )
-				fileinfo['fileID'] = fileID.hexdigest()	
-		
-			# decoding element type (symlink, file, directory)
-			if (fileinfo['mode'] & 0xE000) == 0xA000: obj_type = 'l' # symlink
-			elif (fileinfo['mode'] & 0xE000) == 0x8000: obj_type = '-' # file
-			elif (fileinfo['mode'] & 0xE000) == 0x4000: obj_type = 'd' # dir
-			
-			# separates domain type (AppDomain, HomeDomain, ...) from domain name
-			domaintype, sep, domain = fileinfo['domain'].partition('-')
-			
-			# separates file name from file path
-			filepath, sep, filename = fileinfo['filename'].rpartition('/')
-			if (obj_type == 'd'):
-				filepath = fileinfo['filename']
-				filename = "";
-
-			# Insert record in database
-			query = "INSERT INTO indice(type, permissions, userid, groupid, filelen, mtime, atime, ctime, fileid, domain_type, domain, file_path, file_name, link_target, datahash, flag) VALUES(";
-			query += "'%s'," 	% obj_type
-			query += "'%s'," 	% mbdbdecoding.modestr(fileinfo['mode']&0x0FFF)
-			query += "'%08x'," 	% fileinfo['userid']
-			query += "'%08x'," 	% fileinfo['groupid']
-			query += "%i," 		% fileinfo['filelen']
-			query += "%i," 		% fileinfo['mtime']
-			query += "%i," 		% fileinfo['atime']
-			query += "%i," 		% fileinfo['ctime']
-			query += "'%s'," 	% fileinfo['fileID']
-			query += "'%s'," 	% domaintype.replace("'", "''")
-			query += "'%s'," 	% domain.replace("'", "''")
-			query += "'%s'," 	% filepath.replace("'", "''")
-			query += "'%s'," 	% filename.replace("'", "''")
-			query += "'%s'," 	% fileinfo['linktarget']
-			query += "'%s'," 	% self.hex2nums(fileinfo['datahash'])
-			query += "'%s'" 	% fileinfo['flag']
-			query += ");"
-			self.cursor.execute(query)
-			
-			# check if file has properties to store in the properties table
-			if (fileinfo['numprops'] > 0):
-		
-				query = "SELECT id FROM indice WHERE domain = ? AND fileid = ? LIMIT 1;"
-				 
-				self.cursor.execute(query, (domain.replace("'", "''"), fileinfo['fileID']))
-				id = self.cursor.fetchall()
-				
-				if (len(id) > 0):
-					index = id[0][0]
-					properties = fileinfo['properties']
-
-					query = "INSERT INTO properties(file_id, property_name, property_val) VALUES (?, ?, ?);"
-					rows = ((index, name, self.hex2nums(val)) for name, val in properties.items())
-					self.cursor.executemany(query, rows);
-			
-				#print("File: %s, properties: %i"%(domain + ":" + filepath + "/" + filename, fileinfo['numprops']))
-				#print(fileinfo['properties'])
-				
-			# manage progress bar
-			items += 1;
-			if (items%10 == 0):
-				progress.setValue(items/10)
-
-		self.cursor.execute('CREATE INDEX indice_domain_path on indice (domain_type, domain, file_path);')
-		self.cursor.execute('CREATE INDEX properties_file_id on properties (file_id);')
-		database.commit() 
-		
-		# print banner
-		print("\nWorking directory: %s"%self.backup_path)
-		print("Read elements: %i" %items)
-		
-		# add STANDARD files
-		standardFiles = QtGui.QTreeWidgetItem(None)
-		standardFiles.setText(0, "Standard files")
-		self.ui.fileTree.addTopLevelItem(standardFiles)
-		
-		for elementName in ['Manifest.plist', 'Info.plist', 'Status.plist']:
-			newItem = QtGui.QTreeWidgetItem(standardFiles)
-			newItem.setText(0, elementName)
-			newItem.setText(1, "X")
-			self.ui.fileTree.addTopLevelItem(newItem)		
-
-		# retrieve domain families
-		self.cursor.execute("SELECT DISTINCT(domain_type) FROM indice");
-		domain_types = self.cursor.fetchall()
-		
-		for domain_type_u in domain_types:
-			
-			domain_type = str(domain_type_u[0])
-			
-			newDomainFamily = QtGui.QTreeWidgetItem(None)
-			newDomainFamily.setText(0, domain_type)
-			
-			self.ui.fileTree.addTopLevelItem(newDomainFamily)
-			
-			# show new domain family in main view
-			QtGui.QApplication.processEvents()
-			
-			# retrieve domains for the selected family
-			query = "SELECT DISTINCT(domain) FROM indice WHERE domain_type = ? ORDER BY domain"
-			self.cursor.execute(query, (domain_type,))
-			domain_names = self.cursor.fetchall()
-			
-			for domain_name_u in domain_names:
-				domain_name = str(domain_name_u[0])			
-				
-				if (len(domain_names) > 1):
-					newDomain = QtGui.QTreeWidgetItem(newDomainFamily)
-					newDomain.setText(0, domain_name)
-					self.ui.fileTree.addTopLevelItem(newDomain)
-
-					rootNode = newDomain
-				else:
-					rootNode = newDomainFamily
-			
-				# retrieve paths for selected domain
-				query = "SELECT file_path, file_name, filelen, id, type FROM indice WHERE domain_type = ? AND domain = ? ORDER BY file_path, file_name"
-				self.cursor.execute(query, (domain_type, domain_name))
-				nodes = self.cursor.fetchall()
-
-				pathToNode = {'': rootNode}
-
-				for nodeData in nodes:
-					path = str(nodeData[0])
-					
-					# finding parent directory 
-					lookup = path
-					missing = collections.deque()
-					dirNode = None
-					while dirNode is None:
-						dirNode = pathToNode.get(lookup, None)
-
-						if dirNode is None:
-							lookup, sep, component = lookup.rpartition('/')
-							missing.appendleft(component)
-
-					# creating parent directory if neccesary
-					for component in missing:
-						newPath = QtGui.QTreeWidgetItem(dirNode)
-						newPath.setText(0, component)
-						newPath.setToolTip(0, component)
-						self.ui.fileTree.addTopLevelItem(newPath)
-
-						dirNode = newPath
-						lookup = posixpath.join(lookup, component)
-						pathToNode[lookup] = newPath
-
-					file_name = str(nodeData[1].encode("utf-8"))
-					if (nodeData[2]) < 1024:
-						file_dim = str(nodeData[2]) + " b"
-					else:
-						file_dim = str(nodeData[2] / 1024) + " kb"
-					file_id = int(nodeData[3])
-					file_type = str(nodeData[4])
-
-					if file_type == 'd':
-						newFile = dirNode
-					else:
-						newFile = QtGui.QTreeWidgetItem(newPath)
-						self.ui.fileTree.addTopLevelItem(newFile)
-
-						newFile.setText(0, file_name)
-						newFile.setToolTip(0, file_name)
-						newFile.setText(2, str(file_dim))
-
-					newFile.setText(1, file_type)
-					newFile.setText(3, str(file_id))
-						
-					# manage progress bar
-					items = items + 1
-					if (items%10 == 0):
-						progress.setValue(items/10)
-
 		deviceinfo = plistutils.deviceInfo(os.path.join(self.backup_path, "Info.plist"))
 		device_display_name = "Unknown"
 		device_type = "Unknown"
@@ -1696,8 +1871,97 @@ class IPBA2(QtGui.QMainWindow):
 		textCursor.setPosition(0) 
 		self.ui.backupInfoText.setTextCursor(textCursor) 
 		
-		# clear progressbar
-		progress.setValue(progress.maximum())
+		# add STANDARD files
+		self.fileTreeModel.addStandardFiles(['Manifest.plist', 'Info.plist', 'Status.plist'])
+
+		# the index is opened (and built if not cached) in a background thread: the tree
+		# is filled domain by domain, and can be browsed while the manifest is parsed
+		self.ingestStart = time.time()
+		
+		self.ingestProgress = QtGui.QProgressDialog("Reading backup...", "Abort", 0, 100, self)
+		self.ingestProgress.setWindowModality(QtCore.Qt.NonModal)
+		self.ingestProgress.setMinimumDuration(500)
+		self.ingestProgress.canceled.connect(self.cancelIngest)
+		
+		self.ingestThread = IngestThread(self.backup_path, self.manifestFingerprint, self)
+		self.ingestThread.progress.connect(self.onIngestProgress)
+		self.ingestThread.domainsReady.connect(self.onDomainsReady)
+		self.ingestThread.indexReady.connect(self.onIndexReady)
+		self.ingestThread.finished.connect(self.onIngestFinished)
+		self.ingestThread.start()
+
+	def onIngestProgress(self, done, total):
+		if (self.sender() != self.ingestThread or self.ingestProgress == None or total == 0):
+			return
+		self.ingestProgress.setValue(100 * done / total)
+		
+		# estimated time left, from the average speed so far
+		if (done > 0):
+			elapsed = time.time() - self.ingestStart
+			left = int(elapsed * (total - done) / done)
+			self.ingestProgress.setLabelText("Reading backup... (about %i:%02i left)"%(left / 60, left % 60))
+
+	def closeIngestProgress(self):
+		if (self.ingestProgress != None):
+			# closing the dialog emits canceled()
+			self.ingestProgress.canceled.disconnect(self.cancelIngest)
+			self.ingestProgress.close()
+			self.ingestProgress = None
+
+	def cancelIngest(self):
+		# the partial index is deleted by the ingest thread
+		print("\nReading of backup %s aborted"%self.backup_path)
+		self.closeBackup()
+
+	def onDomainsReady(self, fileName, domains):
+		# signals still queued from the thread of a closed backup
+		if (self.sender() != self.ingestThread):
+			return
+		
+		# the first domains are read through a second connection to the index file
+		if (self.index.database == None):
+			self.index.attach(self.backup_path, fileName)
+			self.cursor = self.index.cursor
+		
+		for domain_type, domain in domains:
+			self.fileTreeModel.addDomain(domain_type, domain)
+
+	def onIndexReady(self):
+		if (self.sender() != self.ingestThread):
+			return
+		
+		thread = self.ingestThread
+		self.closeIngestProgress()
+		
+		# empty manifest: no domain reported
+		if (self.index.database == None):
+			self.index.attach(self.backup_path, thread.fileName)
+			self.cursor = self.index.cursor
+		
+		self.indexComplete = True
+		self.enableAnalysis(True)
+		
+		if (thread.cached):
+			print("\nUsing cached index for %s"%self.backup_path)
+		
+		# print banner
+		print("\nWorking directory: %s"%self.backup_path)
+		print("Read elements: %i" %self.index.stats()['elements'])
+
+	def onIngestFinished(self):
+		if (self.sender() != self.ingestThread):
+			return
+		
+		thread = self.ingestThread
+		self.ingestThread = None
+		thread.deleteLater()
+		self.closeIngestProgress()
+		
+		if (thread.error != None):
+			backup_path = self.backup_path
+			self.closeBackup()
+			exc_type, exc_value, exc_traceback = thread.error
+			QtGui.QMessageBox.warning(self, "Error", "Unable to read backup %s:\n%s"%(backup_path, exc_value))
 
 	def mruAddArchive(self, description, path):
 		"""
@@ -12,7 +12,21 @@
 '''
 
 #!/usr/bin/env python
-import sys
+import sys, os, gc, mmap, struct, array, bisect, binascii, hashlib
+
+# fixed-width part of each MBDB record, following the five leading strings:
+# mode(2) unknown2(4) unknown3(4) userid(4) groupid(4) mtime(4) atime(4) ctime(4)
+# filelen(8) flag(1) numprops(1)
+MBDB_STRLEN = struct.Struct('>H')
+MBDB_FIELDS = struct.Struct('>HIIIIIIIQBB')
+
+# MBDX: 10 bytes of header, then 26-byte records of fileID(20) mbdb_offset(4) mode(2)
+MBDX_HEADER_SIZE = 10
+MBDX_RECORD_SIZE = 26
+# mbdb_offset of one record, and of MBDX_CHUNK consecutive records
+MBDX_OFFSET = struct.Struct('>20xI2x')
+MBDX_CHUNK = 1024
+MBDX_OFFSETS = struct.Struct('>' + '20xI2x' * MBDX_CHUNK)
 
 def getint(data, offset, intsize):
     """Retrieve an integer (big-endian) and new offset from the current offset"""
@@ -31,7 +45,165 @@ def getstring(data, offset):
     value = data[offset:offset+length]
     return value, (offset + length)
 
+class ManifestRecord(object):
+    """One Manifest.mbdb record.
+
+    Slotted replacement for the per-record dict: domain strings are interned,
+    datahash is kept as the raw digest bytes and the property map is only
+    allocated for records that have properties. Item access (record['domain'],
+    record['fileID'] = ...) is still supported for code written against dicts.
+    """
+
+    FIELDS = ('start_offset', 'domain', 'filename', 'linktarget', 'datahash', 'unknown1',
+              'mode', 'unknown2', 'unknown3', 'userid', 'groupid', 'mtime', 'atime', 'ctime',
+              'filelen', 'flag', 'numprops', 'properties')
+
+    __slots__ = ('start_offset', 'domain', 'filename', 'linktarget', 'datahash', 'unknown1',
+                 'mode', 'unknown2', 'unknown3', 'userid', 'groupid', 'mtime', 'atime', 'ctime',
+                 'filelen', 'flag', 'numprops', '_properties', 'fileID')
+
+    def __init__(self, start_offset, domain, filename, linktarget, datahash, unknown1,
+                 mode, unknown2, unknown3, userid, groupid, mtime, atime, ctime,
+                 filelen, flag, numprops, properties=None):
+        self.start_offset = start_offset
+        self.domain = intern(domain)
+        self.filename = filename
+        self.linktarget = linktarget
+        self.datahash = datahash
+        self.unknown1 = unknown1
+        self.mode = mode
+        self.unknown2 = unknown2
+        self.unknown3 = unknown3
+        self.userid = userid
+        self.groupid = groupid
+        self.mtime = mtime
+        self.atime = atime
+        self.ctime = ctime
+        self.filelen = filelen
+        self.flag = flag
+        self.numprops = numprops
+        self._properties = properties or None
+
+    @property
+    def properties(self):
+        # allocated on first access, so that changes to it are kept
+        if self._properties is None:
+            self._properties = {}
+        return self._properties
+
+    @properties.setter
+    def properties(self, value):
+        self._properties = value
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def todict(self):
+        """Return the record in the dict layout of process_mbdb_file_legacy"""
+        fileinfo = dict((name, getattr(self, name)) for name in self.FIELDS)
+        if hasattr(self, 'fileID'):
+            fileinfo['fileID'] = self.fileID
+        return fileinfo
+
+    def __repr__(self):
+        return "<ManifestRecord %s::%s>" % (self.domain, self.filename)
+
+def mapfile(filename):
+    """Return a read-only mmap of the whole file (a plain string if the file is empty)"""
+    f = open(filename, 'rb')
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+
+def iter_mbdb_records(filename):
+    """Yield the records of Manifest.mbdb one at a time (as ManifestRecord), decoding them from an mmap of the file"""
+    data = mapfile(filename)
+    try:
+        if data[0:4] != "mbdb": raise Exception("This does not look like an MBDB file")
+        unpack_strlen = MBDB_STRLEN.unpack_from
+        unpack_fields = MBDB_FIELDS.unpack_from
+        fields_size = MBDB_FIELDS.size
+        size = len(data)
+        offset = 4
+        offset = offset + 2 # value x05 x00, not sure what this is
+        while offset < size:
+            start_offset = offset
+            strings = []
+            for ii in range(5):
+                length = unpack_strlen(data, offset)[0]
+                if length == 0xFFFF:
+                    strings.append('') # Blank string
+                    offset = offset + 2
+                else:
+                    offset = offset + 2 + length
+                    strings.append(data[offset-length:offset])
+            (mode, unknown2, unknown3, userid, groupid, mtime, atime, ctime,
+             filelen, flag, numprops) = unpack_fields(data, offset)
+            offset = offset + fields_size
+            properties = None
+            if numprops > 0:
+                properties = {}
+                for ii in range(numprops):
+                    pair = []
+                    for jj in range(2):
+                        length = unpack_strlen(data, offset)[0]
+                        if length == 0xFFFF:
+                            pair.append('')
+                            offset = offset + 2
+                        else:
+                            offset = offset + 2 + length
+                            pair.append(data[offset-length:offset])
+                    properties[pair[0]] = pair[1]
+            yield ManifestRecord(start_offset, strings[0], strings[1], strings[2], strings[3], strings[4],
+                                 mode, unknown2, unknown3, userid, groupid, mtime, atime, ctime,
+                                 filelen, flag, numprops, properties)
+    finally:
+        if not isinstance(data, str): data.close()
+
 def process_mbdb_file(filename):
+    """Decode the whole Manifest.mbdb into a dict of ManifestRecord keyed by record offset (see iter_mbdb_records)"""
+    mbdb = {} # Map offset of info in this file => file info
+    # records hold no reference cycles: keep the collector from rescanning the
+    # growing dict every few thousand allocations
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for fileinfo in iter_mbdb_records(filename):
+            mbdb[fileinfo['start_offset']] = fileinfo
+    finally:
+        if gc_enabled: gc.enable()
+    return mbdb
+
+def iter_file_ids(records):
+    """Set record['fileID'] = SHA1("domain-filename") (iOS 5+ backup naming) on a stream of records.
+
+    Records are yielded back in the same order. Hashing is done inline: it is
+    about a tenth of the manifest ingest, and a process pool would save at most
+    the part of it not spent pickling keys and digests in the parent (see
+    "fileids" in benchmarks.py).
+    """
+    sha1 = hashlib.sha1
+    for record in records:
+        record['fileID'] = sha1("%s-%s" % (record['domain'], record['filename'])).hexdigest()
+        yield record
+
+def process_mbdb_file_legacy(filename):
+    """Original byte-by-byte decoder, kept as a reference for process_mbdb_file (see benchmarks.py)"""
     mbdb = {} # Map offset of info in this file => file info
     data = open(filename, 'rb').read()
     if data[0:4] != "mbdb": raise Exception("This does not look like an MBDB file")
@@ -64,7 +236,74 @@ def process_mbdb_file(filename):
         mbdb[fileinfo['start_offset']] = fileinfo
     return mbdb
 
+class MbdxIndex(object):
+    """Offset => fileID map decoded from Manifest.mbdx.
+
+    Instead of a dict of 40-char strings it keeps the raw record table plus two
+    arrays (MBDB offsets sorted ascending, and the record each one belongs to);
+    fileID strings are hex-encoded only when looked up.
+    """
+
+    __slots__ = ('table', 'offsets', 'records')
+
+    def __init__(self, table, offsets, records):
+        self.table = table
+        self.offsets = offsets
+        self.records = records
+
+    def _find(self, offset):
+        i = bisect.bisect_left(self.offsets, offset)
+        if i < len(self.offsets) and self.offsets[i] == offset:
+            return self.records[i]
+        return None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, offset):
+        return self._find(offset) is not None
+
+    def __getitem__(self, offset):
+        record = self._find(offset)
+        if record is None:
+            raise KeyError(offset)
+        start = record * MBDX_RECORD_SIZE
+        return binascii.hexlify(self.table[start:start+20])
+
+    def get(self, offset, default=None):
+        if offset in self:
+            return self[offset]
+        return default
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def items(self):
+        for offset in self.offsets:
+            yield offset, self[offset]
+
 def process_mbdx_file(filename):
+    """Decode Manifest.mbdx in bulk into an MbdxIndex (offset of info in the MBDB file => fileID string)"""
+    data = open(filename, 'rb').read()
+    if data[0:4] != "mbdx": raise Exception("This does not look like an MBDX file")
+    table = data[MBDX_HEADER_SIZE:]
+    count = len(table) / MBDX_RECORD_SIZE
+    if len(table) % MBDX_RECORD_SIZE != 0:
+        print >> sys.stderr, "Truncated MBDX file %s: ignoring %d trailing bytes" % (filename, len(table) % MBDX_RECORD_SIZE)
+    # each unpack call picks the mbdb offsets of MBDX_CHUNK records, skipping fileIDs and modes
+    raw_offsets = []
+    chunks = count / MBDX_CHUNK
+    for chunk in xrange(chunks):
+        raw_offsets.extend(MBDX_OFFSETS.unpack_from(table, chunk * MBDX_CHUNK * MBDX_RECORD_SIZE))
+    for record in xrange(chunks * MBDX_CHUNK, count):
+        raw_offsets.append(MBDX_OFFSET.unpack_from(table, record * MBDX_RECORD_SIZE)[0])
+    order = sorted(range(count), key=raw_offsets.__getitem__)
+    offsets = array.array('I', [raw_offsets[i] + 6 for i in order]) # Add 6 to get past prolog
+    records = array.array('I', order)
+    return MbdxIndex(table, offsets, records)
+
+def process_mbdx_file_legacy(filename):
+    """Original record-by-record decoder, kept as a reference for process_mbdx_file (see benchmarks.py)"""
     mbdx = {} # Map offset of info in the MBDB file => fileID string
     data = open(filename).read()
     if data[0:4] != "mbdx": raise Exception("This does not look like an MBDX file")
@@ -116,12 +355,12 @@ def fileinfo_str(f, verbose=False):
 
 verbose = True
 if __name__ == '__main__':
-    mbdb = process_mbdb_file("Manifest.mbdb")
     mbdx = process_mbdx_file("Manifest.mbdx")
-    for offset, fileinfo in mbdb.items():
+    for fileinfo in iter_mbdb_records("Manifest.mbdb"):
+        offset = fileinfo['start_offset']
         if offset in mbdx:
             fileinfo['fileID'] = mbdx[offset]
         else:
             fileinfo['fileID'] = "<nofileID>"
             print >> sys.stderr, "No fileID found for %s" % fileinfo_str(fileinfo)
-        print fileinfo_str(fileinfo, verbose)
\ No newline at end of file
+        print fileinfo_str(fileinfo, verbose)
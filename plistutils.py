@@ -10,9 +10,14 @@
 
 '''
 
-import os, sys, subprocess
+import os, sys, subprocess, struct, math, time, base64, collections, threading, datetime
 import plistlib, biplist
 
+try:
+	from xml.etree.cElementTree import iterparse
+except ImportError:
+	from xml.etree.ElementTree import iterparse
+
 # ------------------------------------------------------------------------------------------------------------------------
 
 # reads a DICT node and returns a python dictionary with key-value pairs
@@ -59,57 +64,282 @@ def readArray(arrayNode):
 
 # ------------------------------------------------------------------------------------------------------------------------
 
-# reads a plist file and returns the content in clear text format
-def readPlist(fileName):
-		
-	# check whether binary or plain
+# Parsed plists are shared by the viewers and the plugins: readPlist keeps them in
+# plistCache, keyed by (path, size, mtime) and read mode, so that a plist read again
+# (Info.plist, Manifest.plist, the plist of a plugin on every click) is not parsed again.
+# The cache is cleared when the backup is closed; plists are evicted least recently
+# used first when the sum of their file sizes exceeds the budget. Callers must not
+# modify the returned objects.
+
+class PlistCache(object):
+
+	def __init__(self, budget=64 << 20):
+		self.budget = budget
+		self.used = 0
+		self.plists = collections.OrderedDict()
+		self.lock = threading.Lock()
+
+	def get(self, key):
+		with self.lock:
+			entry = self.plists.pop(key, None)
+			if (entry != None):
+				self.plists[key] = entry
+				return entry[0]
+		return None
+
+	def put(self, key, plist, size):
+		if (size > self.budget):
+			return
+		with self.lock:
+			old = self.plists.pop(key, None)
+			if (old != None):
+				self.used -= old[1]
+			self.plists[key] = (plist, size)
+			self.used += size
+			while (self.used > self.budget):
+				self.used -= self.plists.popitem(False)[1][1]
+
+	def clear(self):
+		with self.lock:
+			self.plists.clear()
+			self.used = 0
+
+plistCache = PlistCache()
+
+# True if the file starts with the binary plist header
+def isBinaryPlist(fileName):
 	f = open(fileName, 'rb')
 	head = f.read(8)
 	f.close()
+	return head == "bplist00"
+
+# reads a plist file and returns the content in clear text format.
+# With mapped=True a binary plist is memory mapped and its data values are
+# returned as biplist.DataView (copied only when used); with lazy=True its
+# arrays and dicts are biplist.LazyArray and LazyDict, whose elements are
+# decoded when accessed
+def readPlist(fileName, mapped=False, lazy=False):
+		
+	f = open(fileName, 'rb')
 	
 	try:
 	
+		info = os.fstat(f.fileno())
+		key = (os.path.abspath(fileName), info.st_size, info.st_mtime, mapped, lazy)
+		plist = plistCache.get(key)
+		if (plist != None):
+			return plist
+		
+		# check whether binary or plain
+		head = f.read(8)
+		f.seek(0)
+	
 		# plain
 		if head != "bplist00":
-			plist = plistlib.readPlist(fileName)
+			plist = plistlib.readPlist(f)
 	
 		# binary
 		else:
-			plist = biplist.readPlist(fileName)		
+			plist = biplist.PlistReader(f, mapped, lazy).parse()
+		
+		plistCache.put(key, plist, info.st_size)
 				
 	except:
 		print "Unexpected error:", sys.exc_info()
 		return None
 	
+	finally:
+		f.close()
+	
 	return plist
 
 # ------------------------------------------------------------------------------------------------------------------------
 
-# reads a binary plist file and returns the content in xml.dom.minidom object
-def readPlistToXml(filename):
+# Large XML plists (hundreds of MB in some app domains) can be read one element at a time:
+# iterXmlPlist parses the file incrementally (iterparse) and yields the elements of its top
+# array, or of the array under "key" in its top dict, each as soon as its closing tag is read.
+# Elements already yielded are dropped from the tree, so memory stays flat; the file is
+# closed when the iteration stops, also early.
+
+# converts an ElementTree plist element to the value plistlib would return
+def xmlPlistValue(element):
+	tag = element.tag
+	if (tag == "string" or tag == "key"):
+		return element.text or ""
+	elif (tag == "integer"):
+		return int(element.text)
+	elif (tag == "real"):
+		return float(element.text)
+	elif (tag == "true"):
+		return True
+	elif (tag == "false"):
+		return False
+	elif (tag == "date"):
+		return datetime.datetime.strptime(element.text.strip(), "%Y-%m-%dT%H:%M:%SZ")
+	elif (tag == "data"):
+		return plistlib.Data.fromBase64(element.text or "")
+	elif (tag == "array"):
+		return [xmlPlistValue(child) for child in element]
+	elif (tag == "dict"):
+		children = list(element)
+		return dict([(xmlPlistValue(children[i]), xmlPlistValue(children[i + 1])) for i in range(0, len(children) - 1, 2)])
+	raise ValueError("Unknown plist element <%s>" % tag)
 
-	tempfile = os.path.join(os.path.dirname(sys.argv[0]),"out.plist") #default name from perl script plutil.pl
-	command = "perl \"" + os.path.join(os.path.dirname(sys.argv[0]),"IPBAplutil.pl\"")+" \"%s\" "%filename
+def iterXmlPlist(fileName, key=None):
 
+	f = open(fileName, 'rb')
 	try:
-		retval = os.system(command)	
-	except:
-		print "Unexpected error while running command: \"%s\""%command, sys.exc_info()[1]
-		return None
-	
-	if (retval != 0):
-		print("Return value not clear. Unable to decode data.")
-		return None
-	
-	from xml.dom.minidom import parse
+		# open elements: <plist>, top object, ...
+		stack = []
+		target = None
+		lastKey = None
+		
+		for event, element in iterparse(f, events=("start", "end")):
+		
+			if (event == "start"):
+				stack.append(element)
+				if (target is None and len(stack) == 2 and key == None):
+					if (element.tag != "array"):
+						raise ValueError("Top object of %s is a <%s>, not an <array>" % (fileName, element.tag))
+					target = element
+				elif (target is None and len(stack) == 3 and key != None and element.tag == "array" and lastKey == key):
+					target = element
+				continue
+			
+			stack.pop()
+			if (element is target):
+				return
+			if (target is not None and stack[-1] is target):
+				yield xmlPlistValue(element)
+				target.remove(element)
+			elif (target is None and len(stack) == 2):
+				# entries of the top dict before the array
+				if (element.tag == "key"):
+					lastKey = element.text or ""
+				stack[-1].remove(element)
+	finally:
+		f.close()
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# Binary plists are converted to XML in process, with the same layout IPBAplutil.pl
+# used to write to out.plist (kept in the repo as reference for the "plistxml"
+# benchmark): top object at indent 0, sorted dict keys, <ustring> for UTF-16 strings.
+# Keyed archive UIDs, which the Perl script could not read, are written as plutil does
+# (<dict> with a CF$UID integer).
+
+# seconds since 2001-01-01 of a binary plist date, as stored
+class PlistDate(float):
+	pass
+
+# PlistReader returning dates as PlistDate, so that they are printed like the Perl script did
+class XmlPlistReader(biplist.PlistReader):
+
+	def readDate(self):
+		result = PlistDate(struct.unpack(">d", self.contents[self.currentOffset:self.currentOffset+8])[0])
+		self.currentOffset += 8
+		return result
+
+def escapeXml(value):
+	return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+# 8 bit plist strings should be ASCII; other bytes are taken as UTF-8, like the Perl script does
+def plistText(value):
+	if (isinstance(value, str)):
+		return value.decode("utf-8", "replace")
+	return value
+
+def formatReal(value):
+	return ("%.25f" % value).rstrip("0")
+
+def formatDate(value):
+	fraction, seconds = math.modf(value)
+	date = time.gmtime(978307200 + int(seconds))
+	return "%04d-%02d-%02dT%02d:%02d:%.6fZ" % (date.tm_year, date.tm_mon, date.tm_mday, date.tm_hour, date.tm_min, date.tm_sec + fraction)
+
+# returns the XML text (utf-8) of the binary plist file. Raises biplist.InvalidPlistException
+# and biplist.NotBinaryPlistException
+def binaryPlistToXml(filename):
+
+	f = open(filename, 'rb')
 	try:
-		xmldata = parse(tempfile)
+		plist = XmlPlistReader(f).parse()
+	finally:
+		f.close()
+
+	out = [
+		u'<?xml version="1.0" encoding="UTF-8"?>\n',
+		u'<!DOCTYPE plist PUBLIC "-//Apple Computer//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">\n',
+		u'<plist version="1.0">\n',
+	]
+
+	# explicit stack of (value, indent) to write, and of closing tags (strings)
+	stack = [(plist, 0)]
+	while stack:
+		item = stack.pop()
+		if (isinstance(item, unicode)):
+			out.append(item)
+			continue
+
+		value, indent = item
+		tabs = u"\t" * indent
+
+		if (isinstance(value, bool)):
+			out.append(tabs + (value and u"<true/>\n" or u"<false/>\n"))
+		elif (isinstance(value, biplist.Uid)):
+			out.append(u"%s<dict>\n%s\t<key>CF$UID</key>\n%s\t<integer>%d</integer>\n%s</dict>\n" % (tabs, tabs, tabs, value, tabs))
+		elif (isinstance(value, (int, long))):
+			out.append(u"%s<integer>%d</integer>\n" % (tabs, value))
+		elif (isinstance(value, PlistDate)):
+			out.append(u"%s<date>%s</date>\n" % (tabs, formatDate(value)))
+		elif (isinstance(value, float)):
+			out.append(u"%s<real>%s</real>\n" % (tabs, formatReal(value)))
+		elif (isinstance(value, (biplist.Data, biplist.DataView))):
+			# base64 lines of 76 chars, counting tabs as 8 chars
+			encoded = base64.b64encode(str(value))
+			length = max(76 - 8 * indent, 4)
+			out.append(tabs + u"<data>\n")
+			for i in range(0, len(encoded), length):
+				out.append(tabs + unicode(encoded[i:i+length]) + u"\n")
+			out.append(tabs + u"</data>\n")
+		elif (isinstance(value, str)):
+			out.append(u"%s<string>%s</string>\n" % (tabs, escapeXml(plistText(value))))
+		elif (isinstance(value, unicode)):
+			out.append(u"%s<ustring>%s</ustring>\n" % (tabs, escapeXml(value)))
+		elif (isinstance(value, (list, set))):
+			out.append(tabs + u"<array>\n")
+			stack.append(tabs + u"</array>\n")
+			stack.extend([(element, indent + 1) for element in reversed(list(value))])
+		elif (isinstance(value, dict)):
+			out.append(tabs + u"<dict>\n")
+			stack.append(tabs + u"</dict>\n")
+			keys = sorted([(plistText(key), key) for key in value.keys()], reverse=True)
+			for text, key in keys:
+				stack.append((value[key], indent + 1))
+				stack.append(u"%s\t<key>%s</key>\n" % (tabs, escapeXml(text)))
+		elif (value == None):
+			out.append(tabs + u"<null/>\n")
+		else:
+			raise biplist.InvalidPlistException("Unexpected object %r" % (value,))
+
+	out.append(u"</plist>\n")
+	return u"".join(out).encode("utf-8")
+
+# reads a plist file and returns the content in xml.dom.minidom object
+# (binary plists are converted to XML first)
+def readPlistToXml(filename):
+
+	from xml.dom.minidom import parse, parseString
+
+	try:
+		if (isBinaryPlist(filename)):
+			xmldata = parseString(binaryPlistToXml(filename))
+		else:
+			xmldata = parse(filename)
 	except:
-		print "Unexpected error while parsing XML data:", sys.exc_info()[1]
+		print "Unexpected error while converting plist to XML:", sys.exc_info()[1]
 		return None
 	
-	os.remove(tempfile)
-	
 	return xmldata	
 
 # ------------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+'''
+ Analyzer for iPhone backup made by Apple iTunes
+
+ (C)opyright 2013 Mario Piccinelli <mario.piccinelli@gmail.com>
+ Released under MIT licence
+
+ typecache remembers the type (as returned by magic.file) of the backup files,
+ so that selecting a file again, opening its context menu or a viewer does not
+ read it again.
+
+ Types are keyed by (file name, size, mtime) and kept in a LRU dictionary; a
+ TypeCache created with a file name also stores them in a sqlite database (by
+ default types.sqlite in the index cache dir), shared by all the backups.
+ New types are written to the database in batches (see flush).
+
+'''
+
+import os, sys, sqlite3, collections
+
+import magic, indexcache
+
+# ------------------------------------------------------------------------------------------------------------------------
+
+# default file of the persistent layer, next to the cached indexes
+def defaultFileName():
+	return os.path.join(indexcache.cacheDir(), "types.sqlite")
+
+class TypeCache(object):
+
+	# new types written to the database by each executemany call
+	batchSize = 1000
+
+	def __init__(self, size=4096, fileName=None):
+		self.size = size
+		self.types = collections.OrderedDict()
+		self.database = None
+		# rows not written to the database yet
+		self.pending = []
+		if (fileName != None):
+			self.openDatabase(fileName)
+
+	def openDatabase(self, fileName):
+		try:
+			if (not os.path.isdir(os.path.dirname(fileName))):
+				os.makedirs(os.path.dirname(fileName))
+			self.database = sqlite3.connect(fileName)
+			# lost types are only read again: no need for durable writes
+			self.database.execute("PRAGMA synchronous = OFF")
+			self.database.execute("CREATE TABLE IF NOT EXISTS types (fileid VARCHAR(50), size INT, mtime INT, magic VARCHAR(100), PRIMARY KEY (fileid, size, mtime))")
+			self.database.commit()
+		except (OSError, IOError, sqlite3.Error):
+			print("Unable to open type cache %s: %s" % (fileName, sys.exc_info()[1]))
+			self.database = None
+
+	def close(self):
+		if (self.database != None):
+			self.flush()
+			self.database.close()
+		self.database = None
+
+	# key of the file at "path" (os.error if the file does not exist)
+	def key(self, path):
+		info = os.stat(path)
+		name = os.path.basename(path)
+		if (isinstance(name, str)):
+			name = name.decode("utf-8", "replace")
+		return (name, info.st_size, int(info.st_mtime))
+
+	def lookup(self, key):
+		"""
+		Cached type for the key, None if unknown.
+		"""
+		filemagic = self.types.pop(key, None)
+		if (filemagic == None and self.database != None):
+			row = self.database.execute("SELECT magic FROM types WHERE fileid = ? AND size = ? AND mtime = ?", key).fetchone()
+			if (row != None):
+				filemagic = str(row[0])
+		if (filemagic != None):
+			self.remember(key, filemagic, False)
+		return filemagic
+
+	def remember(self, key, filemagic, persist=True):
+		self.types[key] = filemagic
+		while (len(self.types) > self.size):
+			self.types.popitem(False)
+		if (persist and self.database != None):
+			self.pending.append(key + (filemagic,))
+			if (len(self.pending) >= self.batchSize):
+				self.flush()
+
+	def flush(self):
+		"""
+		Writes the types remembered since the last call to the database.
+		"""
+		if (self.database != None and len(self.pending) > 0):
+			self.database.executemany("INSERT OR REPLACE INTO types (fileid, size, mtime, magic) VALUES (?, ?, ?, ?)", self.pending)
+			self.database.commit()
+		self.pending = []
+
+	def get(self, path):
+		"""
+		Type of the file at "path", from the cache or from magic.file.
+		"""
+		key = self.key(path)
+		filemagic = self.lookup(key)
+		if (filemagic == None):
+			filemagic = magic.file(path)
+			self.remember(key, filemagic)
+			self.flush()
+		return filemagic
+
+	def clear(self):
+		self.types.clear()
+		self.pending = []
+		if (self.database != None):
+			self.database.execute("DELETE FROM types")
+			self.database.commit()